@@ -114,6 +114,12 @@ echo ">>> [단계 3/7] 애플리케이션 파일 복사"
 # 여기서는 디렉터리 자체를 복사하기 위해 '/'를 붙이지 않습니다.
 rsync -av "$SOURCE_DIR" "$APP_BASE_DIR/"
 echo "파일 복사 완료."
+# 공통 모듈(저장소 최상위 common/)을 앱 디렉터리로 복사합니다.
+SHARED_MODULES="executor.py metrics.py registry_auth.py"
+for module in $SHARED_MODULES; do
+    cp "$SOURCE_DIR/../common/$module" "$APP_TARGET_DIR/"
+done
+echo "공통 모듈 복사 완료: $SHARED_MODULES"
 echo
 
 # 4. 애플리케이션 파일들의 소유권을 웹 서버 사용자로 변경
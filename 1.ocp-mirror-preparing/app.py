@@ -1,45 +1,40 @@
 import os
 import json
-import subprocess
+import sys
 import re
 from flask import Flask, render_template, request, jsonify, render_template_string
 import requests
 from bs4 import BeautifulSoup
+# 저장소에서 바로 실행할 때는 최상위 common/의 공통 모듈을 사용합니다. (배포 시에는 배포 스크립트가 앱 디렉터리로 복사)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common'))
+import executor
+import metrics
+import registry_auth
 
 # --- 기본 설정 ---
 app = Flask(__name__)
 BASE_DIR = "/ocp_install" 
 APP_DEPLOY_DIR = "/var/www/html/ocp-mirror-preparing" # 실제 배포 경로
-AUTH_DIR = os.path.join(APP_DEPLOY_DIR, ".auth")
-AUTH_FILE_PATH = os.path.join(AUTH_DIR, "auth.json") # apache용 인증 파일 경로
+AUTH_DIR = registry_auth.AUTH_DIR
+AUTH_FILE_PATH = registry_auth.AUTH_FILE_PATH # pull secret + 로컬 registry 계정을 병합한 인증 파일
 INSTALL_AGENT_DIR = os.path.join(BASE_DIR, "install-agent")
 OC_MIRROR_BASE_DIR = os.path.join(BASE_DIR, "oc-mirror")
 VERSION_FILE_PATH = os.path.join(BASE_DIR, "versions.txt")
 OPERATOR_OUTPUT_DIR = os.path.join(BASE_DIR, "operator_lists")
 MIRROR_CONFIG_DIR = os.path.join(OC_MIRROR_BASE_DIR, "mirror-config")
 MIRROR_IMAGES_DIR = os.path.join(OC_MIRROR_BASE_DIR, "mirror-images")
+MIRROR_LOG_PATH = os.path.join(executor.LOG_DIR, "oc-mirror.log")
+MIRROR_JOB_PATH = os.path.join(executor.LOG_DIR, "oc-mirror.job.json")
+REQUEST_COMMAND_TIMEOUT = 840  # gunicorn --timeout(900초, 1_scripts.sh)보다 짧게 유지
 
 # --- Helper 함수 ---
-def run_command(command, extra_env=None):
-    """지정된 셸 명령어를 실행하고 결과를 반환합니다."""
-    final_command = command
-    if extra_env:
-        exports = " && ".join([f"export {key}='{value}'" for key, value in extra_env.items()])
-        final_command = f"{exports} && {command}"
+def run_command(argv, extra_env=None, **kwargs):
+    """argv 목록으로 명령을 실행하고 결과를 반환합니다. (셸을 거치지 않으며 extra_env는 환경 변수로 전달)"""
+    return executor.run(argv, env=extra_env, **kwargs)
 
-    try:
-        result = subprocess.run(
-            final_command,
-            shell=True,
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            executable='/bin/bash'
-        )
-        return {"success": True, "output": result.stdout, "error": result.stderr}
-    except subprocess.CalledProcessError as e:
-        return {"success": False, "output": e.stdout, "error": e.stderr}
+def run_commands(*commands, **kwargs):
+    """여러 명령을 순서대로 실행하고 첫 번째 실패에서 중단합니다."""
+    return executor.run_sequence(commands, **kwargs)
 
 # 애플리케이션 시작 시 디렉터리 권한을 보장하는 함수
 def setup_directories_and_permissions():
@@ -52,18 +47,29 @@ def setup_directories_and_permissions():
             os.path.join(OC_MIRROR_BASE_DIR, "tekton"),
             os.path.join(OC_MIRROR_BASE_DIR, "butane"),
             os.path.join(OC_MIRROR_BASE_DIR, "mirror-registry"),
-            OPERATOR_OUTPUT_DIR, MIRROR_CONFIG_DIR, MIRROR_IMAGES_DIR,
+            OPERATOR_OUTPUT_DIR, MIRROR_CONFIG_DIR, MIRROR_IMAGES_DIR, executor.LOG_DIR,
         ]
-        for d in dirs_to_create:
-            run_command(f"sudo mkdir -p {d}")
-        
-        run_command(f"sudo chown -R apache:apache {BASE_DIR}")
+        run_command(["sudo", "mkdir", "-p", *dirs_to_create])
+        run_command(["sudo", "chown", "-R", "apache:apache", BASE_DIR])
         print("INFO: Directory setup completed successfully.")
     except Exception as e:
         print(f"ERROR during directory setup: {e}")
 
 setup_directories_and_permissions()
 
+# --- 성능 계측 (/metrics, /api/timeline) ---
+# command_key 또는 endpoint 이름 -> 설치 단계
+# 'mirror' 단계는 run_mirror의 감시 프로세스가 직접 기록합니다. (list_operators는 카탈로그 조회라 제외)
+STAGE_MAP = {
+    'download_installer_client': 'download', 'unpack_installer_client': 'download',
+    'download_oc_mirror': 'download', 'unpack_oc_mirror': 'download',
+    'download_helm': 'download', 'unpack_helm': 'download',
+    'download_tekton': 'download', 'unpack_tekton': 'download',
+    'download_butane': 'download', 'install_butane': 'download',
+    'download_mirror_registry': 'download', 'unpack_mirror_registry': 'download',
+}
+metrics.init_app(app, 'ocp-mirror-preparing', STAGE_MAP)
+
 # --- 기본 페이지 및 API 라우팅 ---
 @app.route('/')
 def index():
@@ -91,31 +97,48 @@ def get_ocp_versions():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
+def mirror_registry_files():
+    """mirror-registry 디렉터리의 파일 목록을 반환합니다. (셸의 'mirror-registry/*' 확장 대신 사용)"""
+    registry_dir = os.path.join(OC_MIRROR_BASE_DIR, "mirror-registry")
+    return [os.path.join(registry_dir, name) for name in sorted(os.listdir(registry_dir))
+            if os.path.isfile(os.path.join(registry_dir, name))] if os.path.isdir(registry_dir) else []
+
 @app.route('/api/execute-command', methods=['POST'])
 def execute_command_route():
     data = request.json
     command_key = data.get('command_key')
     version = data.get('version')
+    client_url = f"https://mirror.openshift.com/pub/openshift-v4/x86_64/clients/ocp/{version}"
     commands = {
-        'download_installer_client': f"wget https://mirror.openshift.com/pub/openshift-v4/x86_64/clients/ocp/{version}/openshift-install-linux.tar.gz -P {INSTALL_AGENT_DIR} && wget https://mirror.openshift.com/pub/openshift-v4/x86_64/clients/ocp/{version}/openshift-client-linux.tar.gz -P {INSTALL_AGENT_DIR}",
-        'unpack_installer_client': f"sudo tar --overwrite -xzf {INSTALL_AGENT_DIR}/openshift-install-linux.tar.gz -C /usr/local/bin/ && sudo tar --overwrite -xzf {INSTALL_AGENT_DIR}/openshift-client-linux.tar.gz -C /usr/local/bin/",
-        'oc_version': "oc version",
-        'openshift_install_version': "openshift-install version",
-        'download_oc_mirror': f"wget https://mirror.openshift.com/pub/openshift-v4/x86_64/clients/ocp/{version}/oc-mirror.tar.gz -P {OC_MIRROR_BASE_DIR}",
-        'unpack_oc_mirror': f"sudo tar --overwrite -xzf {OC_MIRROR_BASE_DIR}/oc-mirror.tar.gz -C /usr/local/bin/ && sudo chmod 755 /usr/local/bin/oc-mirror",
-        'download_helm': f"wget -P {OC_MIRROR_BASE_DIR}/helm/ https://mirror.openshift.com/pub/openshift-v4/clients/helm/latest/helm-linux-amd64.tar.gz",
-        'unpack_helm': f"sudo tar --overwrite -xzf {OC_MIRROR_BASE_DIR}/helm/helm-linux-amd64.tar.gz -C /usr/local/bin/",
-        'download_tekton': f"wget -P {OC_MIRROR_BASE_DIR}/tekton https://mirror.openshift.com/pub/openshift-v4/clients/pipeline/latest/tkn-linux-amd64.tar.gz",
-        'unpack_tekton': f"sudo tar --overwrite -xzf {OC_MIRROR_BASE_DIR}/tekton/tkn-linux-amd64.tar.gz -C /usr/local/bin/",
-        'download_butane': f"wget -P {OC_MIRROR_BASE_DIR}/butane https://mirror.openshift.com/pub/openshift-v4/clients/butane/latest/butane",
-        'install_butane': f"sudo chmod 755 {OC_MIRROR_BASE_DIR}/butane/butane && sudo cp {OC_MIRROR_BASE_DIR}/butane/butane /usr/local/bin/",
-        'download_mirror_registry': f"wget -P {OC_MIRROR_BASE_DIR}/mirror-registry/ https://mirror.openshift.com/pub/cgw/mirror-registry/latest/mirror-registry-amd64.tar.gz",
-        'unpack_mirror_registry': f"tar --overwrite -xzf {OC_MIRROR_BASE_DIR}/mirror-registry/mirror-registry-amd64.tar.gz -C {OC_MIRROR_BASE_DIR}/mirror-registry/ && sudo cp {OC_MIRROR_BASE_DIR}/mirror-registry/* /usr/local/bin/",
+        'download_installer_client': [["wget", f"{client_url}/openshift-install-linux.tar.gz", "-P", INSTALL_AGENT_DIR],
+                                      ["wget", f"{client_url}/openshift-client-linux.tar.gz", "-P", INSTALL_AGENT_DIR]],
+        'unpack_installer_client': [["sudo", "tar", "--overwrite", "-xzf", f"{INSTALL_AGENT_DIR}/openshift-install-linux.tar.gz", "-C", "/usr/local/bin/"],
+                                    ["sudo", "tar", "--overwrite", "-xzf", f"{INSTALL_AGENT_DIR}/openshift-client-linux.tar.gz", "-C", "/usr/local/bin/"]],
+        'oc_version': [["oc", "version"]],
+        'openshift_install_version': [["openshift-install", "version"]],
+        'download_oc_mirror': [["wget", f"{client_url}/oc-mirror.tar.gz", "-P", OC_MIRROR_BASE_DIR]],
+        'unpack_oc_mirror': [["sudo", "tar", "--overwrite", "-xzf", f"{OC_MIRROR_BASE_DIR}/oc-mirror.tar.gz", "-C", "/usr/local/bin/"],
+                             ["sudo", "chmod", "755", "/usr/local/bin/oc-mirror"]],
+        'download_helm': [["wget", "-P", f"{OC_MIRROR_BASE_DIR}/helm/", "https://mirror.openshift.com/pub/openshift-v4/clients/helm/latest/helm-linux-amd64.tar.gz"]],
+        'unpack_helm': [["sudo", "tar", "--overwrite", "-xzf", f"{OC_MIRROR_BASE_DIR}/helm/helm-linux-amd64.tar.gz", "-C", "/usr/local/bin/"]],
+        'download_tekton': [["wget", "-P", f"{OC_MIRROR_BASE_DIR}/tekton", "https://mirror.openshift.com/pub/openshift-v4/clients/pipeline/latest/tkn-linux-amd64.tar.gz"]],
+        'unpack_tekton': [["sudo", "tar", "--overwrite", "-xzf", f"{OC_MIRROR_BASE_DIR}/tekton/tkn-linux-amd64.tar.gz", "-C", "/usr/local/bin/"]],
+        'download_butane': [["wget", "-P", f"{OC_MIRROR_BASE_DIR}/butane", "https://mirror.openshift.com/pub/openshift-v4/clients/butane/latest/butane"]],
+        'install_butane': [["sudo", "chmod", "755", f"{OC_MIRROR_BASE_DIR}/butane/butane"],
+                           ["sudo", "cp", f"{OC_MIRROR_BASE_DIR}/butane/butane", "/usr/local/bin/"]],
+        'download_mirror_registry': [["wget", "-P", f"{OC_MIRROR_BASE_DIR}/mirror-registry/", "https://mirror.openshift.com/pub/cgw/mirror-registry/latest/mirror-registry-amd64.tar.gz"]],
+        'unpack_mirror_registry': [["tar", "--overwrite", "-xzf", f"{OC_MIRROR_BASE_DIR}/mirror-registry/mirror-registry-amd64.tar.gz", "-C", f"{OC_MIRROR_BASE_DIR}/mirror-registry/"]],
     }
-    command_to_run = commands.get(command_key)
-    if not command_to_run:
+    commands_to_run = commands.get(command_key)
+    if not commands_to_run:
         return jsonify({"success": False, "error": "Unknown command key."})
-    result = run_command(command_to_run)
+    if command_key.startswith('download_'):
+        metrics.set_run(version=version)
+    timeout = REQUEST_COMMAND_TIMEOUT if command_key.startswith('download_') else executor.DEFAULT_TIMEOUT
+    result = run_commands(*commands_to_run, timeout=timeout)
+    # 'mirror-registry/*' 복사는 압축 해제가 끝난 뒤의 파일 목록으로 수행합니다.
+    if command_key == 'unpack_mirror_registry' and result['success']:
+        result = run_command(["sudo", "cp", *mirror_registry_files(), "/usr/local/bin/"])
     return jsonify(result)
 
 # --- Section 3: Mirror Image 준비 ---
@@ -125,25 +148,21 @@ def apply_pull_secret():
     pull_secret = data.get('pull_secret')
     if not pull_secret:
         return jsonify({"success": False, "error": "Pull Secret 내용이 없습니다."})
+    # 검증/병합/원자적 쓰기를 프로세스 안에서 처리하므로 mkdir/chown 프로세스를 띄우지 않습니다.
     try:
-        json.loads(pull_secret)
-    except json.JSONDecodeError:
-        return jsonify({"success": False, "error": "유효하지 않은 JSON 형식입니다."})
-    mkdir_cmd = f"sudo mkdir -p {AUTH_DIR}"
-    chown_dir_cmd = f"sudo chown apache:apache {AUTH_DIR}"
-    dir_result = run_command(f"{mkdir_cmd} && {chown_dir_cmd}")
-    if not dir_result['success']:
-        return jsonify({"success": False, "error": f"인증 디렉터리 생성 실패: {dir_result['error']}"})
-    try:
-        with open(AUTH_FILE_PATH, 'w') as f:
-            f.write(pull_secret)
-    except IOError as e:
-         return jsonify({"success": False, "error": f"인증 파일 쓰기 실패: {str(e)}"})
-    chown_file_cmd = f"sudo chown apache:apache {AUTH_FILE_PATH}"
-    file_result = run_command(chown_file_cmd)
-    if not file_result['success']:
-        return jsonify({"success": False, "error": f"인증 파일 권한 설정 실패: {file_result['error']}"})
-    return jsonify({"success": True, "message": f"✅ Pull Secret이 {AUTH_FILE_PATH}에 성공적으로 적용되었습니다."})
+        auths = registry_auth.apply_pull_secret(pull_secret)
+    except registry_auth.AuthError as e:
+        return jsonify({"success": False, "error": str(e)})
+    except OSError as e:
+        return jsonify({"success": False, "error": f"인증 파일 쓰기 실패: {str(e)}"})
+    return jsonify({"success": True, "message": f"✅ Pull Secret이 {AUTH_FILE_PATH}에 성공적으로 적용되었습니다. (registry {len(auths)}개)"})
+
+def check_registry_auth(*registries):
+    """명령 실행 전에 필요한 registry 자격 증명이 인증 파일에 있는지 확인합니다. 문제가 없으면 None을 반환합니다."""
+    missing = registry_auth.missing_registries(*registries)
+    if missing:
+        return {"success": False, "error": f"{', '.join(missing)} 인증 정보가 없습니다. 먼저 Pull Secret을 적용하세요."}
+    return None
 
 @app.route('/api/list-operators', methods=['POST'])
 def list_operators():
@@ -155,12 +174,13 @@ def list_operators():
     catalog_url = f"registry.redhat.io/redhat/{catalog}:v{version}"
     output_filename = os.path.join(OPERATOR_OUTPUT_DIR, f"{catalog.replace('-index','')}.out")
     
-    command = f"oc-mirror list operators --catalog={catalog_url} > {output_filename}"
-    extra_env = {
-        "REGISTRY_AUTH_FILE": AUTH_FILE_PATH,
-        "XDG_RUNTIME_DIR": AUTH_DIR
-    }
-    result = run_command(command, extra_env=extra_env)
+    auth_error = check_registry_auth("registry.redhat.io")
+    if auth_error:
+        return jsonify(auth_error)
+
+    command = ["oc-mirror", "list", "operators", f"--catalog={catalog_url}"]
+    # 목록 출력은 메모리에 모으지 않고 파일로 바로 기록합니다.
+    result = run_command(command, extra_env=registry_auth.command_env(), stdout_path=output_filename, timeout=REQUEST_COMMAND_TIMEOUT)
     
     if not result['success']:
         return jsonify(result)
@@ -205,23 +225,31 @@ def generate_imageset():
 @app.route('/api/run-mirror', methods=['POST'])
 def run_mirror():
     config_file = os.path.join(MIRROR_CONFIG_DIR, 'imagesetconfig.yaml')
+    auth_error = check_registry_auth("quay.io", "registry.redhat.io")
+    if auth_error:
+        return jsonify(auth_error)
     # [수정] --v2 명령어에 --authfile 옵션을 사용하도록 수정
-    command = f"oc mirror --authfile {AUTH_FILE_PATH} -c {config_file} file://{MIRROR_IMAGES_DIR} --v2"
-    
-    # XDG_RUNTIME_DIR은 여전히 필요할 수 있음
-    extra_env = {
-        "XDG_RUNTIME_DIR": AUTH_DIR
-    }
-    
-    final_command = command
-    exports = " && ".join([f"export {key}='{value}'" for key, value in extra_env.items()])
-    final_command = f"{exports} && {final_command}"
+    command = ["oc", "mirror", "--authfile", AUTH_FILE_PATH, "-c", config_file, f"file://{MIRROR_IMAGES_DIR}", "--v2"]
+    extra_env = registry_auth.command_env()
 
     try:
-        subprocess.Popen(final_command, shell=True, executable='/bin/bash')
-        return jsonify({"success": True, "message": f"Mirroring process started in the background. Check server logs for progress. Images will be saved to {MIRROR_IMAGES_DIR}"})
-    except Exception as e:
+        # 미러링은 몇 시간씩 걸리므로 worker와 분리하여 실행하고, 출력은 로그 파일로 직접 기록합니다.
+        # 종료 시 감시 프로세스가 작업 파일과 타임라인('mirror' 단계)에 결과를 남깁니다.
+        job = executor.start_detached(command, MIRROR_JOB_PATH, MIRROR_LOG_PATH, env=extra_env,
+                                      event=metrics.job_event('mirror', 'run_mirror'),
+                                      event_path=metrics.TIMELINE_PATH)
+    except OSError as e:
         return jsonify({"success": False, "error": f"Failed to start mirroring: {str(e)}"})
+    if job is None:
+        return jsonify({"success": False, "error": f"이미 미러링 작업이 실행 중입니다. 진행 상황은 {MIRROR_LOG_PATH}에서 확인하세요."})
+    return jsonify({"success": True, "message": f"Mirroring process started in the background. Check {MIRROR_LOG_PATH} for progress. Images will be saved to {MIRROR_IMAGES_DIR}"})
+
+@app.route('/api/cancel-mirror', methods=['POST'])
+def cancel_mirror():
+    """백그라운드로 실행 중인 oc mirror를 중단합니다. (pid와 시작 시각이 작업 파일과 일치할 때만 중단)"""
+    if not executor.cancel_job(MIRROR_JOB_PATH):
+        return jsonify({"success": False, "error": "실행 중인 미러링 작업이 없습니다."})
+    return jsonify({"success": True, "message": "미러링 작업을 중단했습니다."})
 
 # --- 애플리케이션 실행 ---
 if __name__ == '__main__':
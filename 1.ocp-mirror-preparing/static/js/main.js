@@ -212,6 +212,13 @@ document.addEventListener('DOMContentLoaded', () => {
         showResult(outputBox, result);
     });
 
+    document.getElementById('btn_cancel_mirror').addEventListener('click', async () => {
+        const outputBox = document.getElementById('output_run_mirror');
+        showLoading(outputBox);
+        const result = await callApi('/api/cancel-mirror', {});
+        showResult(outputBox, result);
+    });
+
     // --- Initial Load ---
     fetchOcpVersions();
 });
@@ -1,11 +1,16 @@
 import os
 import json
-import subprocess
+import sys
 import csv
 from io import StringIO
 from flask import Flask, render_template, request, jsonify, make_response, render_template_string
 import glob
 import yaml # PyYAML 라이브러리 임포
+# 저장소에서 바로 실행할 때는 최상위 common/의 공통 모듈을 사용합니다. (배포 시에는 배포 스크립트가 앱 디렉터리로 복사)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common'))
+import inventory
+import executor
+import metrics
 
 
 # --- 기본 설정 ---
@@ -14,12 +19,23 @@ DATA_DIR = 'data'
 KEY_DIR = '/ocp_install/generated_keys'
 CREATE_CONFIG_DIR = '/ocp_install/create_config'
 ALLOWED_EXTENSIONS = {'csv'}
+INVENTORY_EXTENSIONS = {'csv', 'yaml', 'yml'}
 OC_MIRROR_RESULTS_DIR = "/ocp_install/oc-mirror/mirror-images/working-dir/cluster-resources/"
 
 # --- 애플리케이션 시작 시 디렉토리 생성 ---
 os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(KEY_DIR, exist_ok=True)
 os.makedirs(CREATE_CONFIG_DIR, exist_ok=True)
+os.makedirs(executor.LOG_DIR, exist_ok=True)
+
+# --- 성능 계측 (/metrics, /api/timeline) ---
+# endpoint 이름 -> 설치 단계
+STAGE_MAP = {
+    'generate_install_config': 'config',
+    'generate_agent_config': 'config',
+    'generate_cluster_configs': 'config',
+}
+metrics.init_app(app, 'ocp-installer-helper', STAGE_MAP)
 
 
 def allowed_file(filename):
@@ -29,16 +45,9 @@ def allowed_file(filename):
 
 
 # [수정] 누락된 run_command 함수 추가
-def run_command(command):
-    """지정된 셸 명령어를 실행하고 결과를 반환합니다."""
-    try:
-        result = subprocess.run(
-            command, shell=True, check=True,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
-        return {"success": True, "output": result.stdout, "error": result.stderr}
-    except subprocess.CalledProcessError as e:
-        return {"success": False, "output": e.stdout, "error": e.stderr}
+def run_command(argv, **kwargs):
+    """argv 목록으로 명령을 실행하고 결과를 반환합니다. (셸을 거치지 않음)"""
+    return executor.run(argv, **kwargs)
 
 # [수정] idms/itms 파일을 찾아 파싱하는 헬퍼 함수
 def find_and_parse_mirror_yamls():
@@ -134,7 +143,9 @@ def generate_ssh_key():
     private_key_path = os.path.join(KEY_DIR, key_name)
     public_key_path = f"{private_key_path}.pub"
     if os.path.exists(private_key_path): return "이미 해당 이름의 키가 존재합니다.", 409
-    subprocess.run(f"ssh-keygen -t rsa -b 4096 -f {private_key_path} -N ''", shell=True, check=True)
+    result = run_command(["ssh-keygen", "-t", "rsa", "-b", "4096", "-f", private_key_path, "-N", ""])
+    if not result['success']:
+        return f"SSH 키 생성 실패: {result['error']}", 500
     return f"✅ SSH 키가 '{public_key_path}'에 생성되었습니다."
 
 @app.route('/api/get-ssh-key/<key_name>')
@@ -172,7 +183,7 @@ def get_mirror_ca():
 
     try:
         # 파일을 읽기 전에 모든 사용자에게 읽기 권한을 부여합니다.
-        chmod_result = run_command(f"sudo chmod a+r {ca_path}")
+        chmod_result = run_command(["sudo", "chmod", "a+r", ca_path])
         if not chmod_result['success']:
             return jsonify({"success": False, "error": f"파일 권한 변경 실패: {chmod_result['error']}"})
 
@@ -206,37 +217,46 @@ def get_mirror_ca():
 
 
 # --- YAML 생성 라우팅 ---
-@app.route('/generate-install-config', methods=['POST'])
-def generate_install_config():
-    """폼 데이터로 install-config.yaml 파일을 생성하여 로컬에 저장합니다."""
-    config_data = request.form.to_dict()
+def render_config_file(template_name, target_name, **context):
+    """templates/의 Jinja2 템플릿을 렌더링하여 CREATE_CONFIG_DIR에 저장합니다."""
+    with open(os.path.join('templates', template_name)) as f:
+        template_str = f.read()
+    rendered_yaml = render_template_string(template_str, **context)
+
+    target_path = os.path.join(CREATE_CONFIG_DIR, target_name)
+    with open(target_path, 'w', encoding='utf-8') as f:
+        f.write(rendered_yaml)
+
+
+def build_install_config_data(form):
+    """install-config 폼 데이터를 템플릿 컨텍스트로 변환합니다. 실패 시 (None, 오류 메시지)를 반환합니다."""
+    config_data = form.to_dict()
     config_data['proxy_enabled'] = 'proxy_enabled' in config_data
 
     # [수정] '미러레지스트리 사용' 체크 시 idms/itms 파일에서 imageContentSources를 동적으로 생성
     if 'mirror_enabled' in config_data:
         sources, error = find_and_parse_mirror_yamls()
         if error:
-            # 오류가 발생하면 사용자에게 알림
-            return f"❌ imageContentSources 생성 실패: {error}"
+            return None, f"imageContentSources 생성 실패: {error}"
         config_data['imageContentSources'] = sources
     else:
         config_data['imageContentSources'] = []
+    return config_data, None
 
-    with open('templates/install-config.yaml.j2') as f:
-        template_str = f.read()
-    rendered_yaml = render_template_string(template_str, **config_data)
 
-    target_path = os.path.join(CREATE_CONFIG_DIR, 'install-config.yaml')
-    with open(target_path, 'w', encoding='utf-8') as f:
-        f.write(rendered_yaml)
+@app.route('/generate-install-config', methods=['POST'])
+def generate_install_config():
+    """폼 데이터로 install-config.yaml 파일을 생성하여 로컬에 저장합니다."""
+    config_data, error = build_install_config_data(request.form)
+    if error:
+        # 오류가 발생하면 사용자에게 알림
+        return f"❌ {error}"
 
+    metrics.set_run(cluster=config_data.get('metadataName'))
+    render_config_file('install-config.yaml.j2', 'install-config.yaml', **config_data)
     return f"✅ install-config.yaml 파일이 {os.path.abspath(CREATE_CONFIG_DIR)}에 생성되었습니다."
 
 
-
-
-
-
 @app.route('/generate-agent-config', methods=['POST'])
 def generate_agent_config():
     """폼 데이터로 agent-config.yaml 파일을 생성하여 로컬에 저장합니다."""
@@ -249,17 +269,48 @@ def generate_agent_config():
         'additionalNTPSources': form_data.get('additionalNTPSources'),
         'nodes': nodes
     }
-    with open('templates/agent-config.yaml.j2') as f:
-        template_str = f.read()
-    rendered_yaml = render_template_string(template_str, **agent_config_data)
-    
-    target_path = os.path.join(CREATE_CONFIG_DIR, 'agent-config.yaml')
-    with open(target_path, 'w', encoding='utf-8') as f:
-        f.write(rendered_yaml)
-        
+    render_config_file('agent-config.yaml.j2', 'agent-config.yaml', **agent_config_data)
     return f"✅ agent-config.yaml 파일이 {os.path.abspath(CREATE_CONFIG_DIR)}에 생성되었습니다."
 
 
+@app.route('/generate-cluster-configs', methods=['POST'])
+def generate_cluster_configs():
+    """
+    호스트 인벤토리(CSV/YAML)와 install-config 폼 데이터로
+    install-config.yaml과 agent-config.yaml을 한 번에 생성합니다.
+    """
+    file = request.files.get('inventory_file')
+    if not file or file.filename == '':
+        return "인벤토리 파일이 선택되지 않았습니다.", 400
+    if '.' not in file.filename or file.filename.rsplit('.', 1)[1].lower() not in INVENTORY_EXTENSIONS:
+        return "허용되지 않는 인벤토리 형식입니다. (.csv, .yaml, .yml)", 400
+
+    config_data, error = build_install_config_data(request.form)
+    if error:
+        return f"❌ {error}"
+
+    try:
+        inventory_data = inventory.parse_inventory(file.stream.read().decode("UTF-8"), file.filename)
+        cluster_domain = f"{config_data.get('metadataName')}.{config_data.get('baseDomain')}"
+        nodes = inventory.build_hosts(inventory_data, cluster_domain, config_data.get('machineNetworkCIDR') or None)
+    except (inventory.InventoryError, yaml.YAMLError, ValueError) as e:
+        return f"❌ 인벤토리 검증 실패:\n{e}", 400
+
+    config_data['worker_replicas'] = sum(1 for node in nodes if node['role'] == 'worker')
+    config_data['master_replicas'] = sum(1 for node in nodes if node['role'] == 'master')
+    metrics.set_run(cluster=config_data.get('metadataName'))
+    agent_config_data = {
+        'metadata_name': config_data.get('metadataName'),
+        'rendezvousIP': request.form.get('inventory_rendezvousIP') or inventory.rendezvous_ip(nodes),
+        'additionalNTPSources': request.form.get('inventory_ntp'),
+        'nodes': nodes
+    }
+    render_config_file('install-config.yaml.j2', 'install-config.yaml', **config_data)
+    render_config_file('agent-config.yaml.j2', 'agent-config.yaml', **agent_config_data)
+    return (f"✅ 호스트 {len(nodes)}대에 대한 install-config.yaml 과 agent-config.yaml 파일이 "
+            f"{os.path.abspath(CREATE_CONFIG_DIR)}에 생성되었습니다.")
+
+
 # --- 애플리케이션 실행 ---
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5023)
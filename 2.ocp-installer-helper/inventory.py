@@ -0,0 +1,278 @@
+import csv
+import ipaddress
+import re
+from io import StringIO
+
+import yaml
+
+# --- 호스트 인벤토리 → agent-config hosts 변환 ---
+# CSV/YAML 인벤토리(MAC, NIC, bond, VLAN, root device hint)를 읽어
+# agent-config.yaml.j2가 기대하는 노드 구조(main.js가 만들던 것과 동일한 형태)로 변환합니다.
+
+MAC_PATTERN = re.compile(r'^[0-9a-f]{2}(:[0-9a-f]{2}){5}$')
+ROLES = {'master', 'worker', 'infra'}
+# agent 기반 설치가 지원하는 control plane 노드 수 (SNO 또는 3-node)
+SUPPORTED_MASTER_COUNTS = (1, 3)
+
+# agent-config rootDeviceHints가 지원하는 키 -> 값 타입
+ROOT_DEVICE_HINTS = {
+    'deviceName': str, 'hctl': str, 'model': str, 'vendor': str, 'serialNumber': str,
+    'minSizeGigabytes': int, 'wwn': str, 'rotational': bool,
+}
+
+# 인벤토리에 profiles가 없을 때 사용하는 기본 NIC 프로파일
+DEFAULT_PROFILES = {
+    'ethernet': {'type': 'ethernet', 'ports': ['ens3']},
+    'bond': {'type': 'bond', 'name': 'bond0', 'ports': ['ens3', 'ens4'],
+             'mode': 'active-backup', 'miimon': 100},
+}
+DEFAULT_ROLE_PROFILES = {'master': 'ethernet', 'worker': 'ethernet', 'infra': 'ethernet'}
+
+
+class _InventoryLoader(yaml.SafeLoader):
+    """
+    YAML 1.1의 60진수 정수 해석을 끈 SafeLoader.
+    기본 로더는 따옴표 없는 52:54:00:11:22:33 같은 MAC 주소를 정수로 읽으므로 문자열로 유지합니다.
+    """
+
+
+_InventoryLoader.yaml_implicit_resolvers = {
+    ch: [(tag, regexp) for tag, regexp in resolvers if tag != 'tag:yaml.org,2002:int']
+    for ch, resolvers in yaml.SafeLoader.yaml_implicit_resolvers.items()
+}
+_InventoryLoader.add_implicit_resolver(
+    'tag:yaml.org,2002:int',
+    re.compile(r'''^(?:[-+]?0b[0-1_]+
+                |[-+]?0[0-7_]+
+                |[-+]?(?:0|[1-9][0-9_]*)
+                |[-+]?0x[0-9a-fA-F_]+)$''', re.X),
+    list('-+0123456789'))
+
+
+class InventoryError(ValueError):
+    """인벤토리 형식 또는 검증 오류. errors에 호스트별 오류 메시지를 모두 담습니다."""
+
+    def __init__(self, errors):
+        super().__init__('\n'.join(errors))
+        self.errors = errors
+
+
+def _split(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in re.split(r'[;,\s]+', str(value)) if v.strip()]
+
+
+def parse_inventory(content, filename):
+    """
+    업로드된 인벤토리 파일을 파싱합니다.
+    - CSV: 한 행이 한 호스트 (hostname, role, profile, macs, ip, prefix, gateway, dns, root_device, vlan, mtu)
+    - YAML: {defaults, profiles, role_profiles, hosts: [...]}
+    """
+    if filename.lower().endswith(('.yaml', '.yml')):
+        inventory = yaml.load(content, Loader=_InventoryLoader) or {}
+        if not isinstance(inventory, dict) or not isinstance(inventory.get('hosts'), list):
+            raise InventoryError(["YAML 인벤토리에는 'hosts' 목록이 필요합니다."])
+        return inventory
+    rows = [{k.strip(): (v or '').strip() for k, v in row.items() if k}
+            for row in csv.DictReader(StringIO(content))]
+    return {'hosts': [{k: v for k, v in row.items() if v} for row in rows]}
+
+
+def _interfaces_for(host, profile, macs, errors):
+    """프로파일과 MAC 목록으로 interfaces / networkConfig.interfaces 항목을 만듭니다."""
+    ports = _split(host.get('interfaces')) or profile.get('ports', [])
+    if len(macs) != len(ports):
+        errors.append(f"{host['hostname']}: MAC {len(macs)}개와 NIC {len(ports)}개({', '.join(ports)})의 수가 일치하지 않습니다.")
+        return [], [], None
+
+    mtu = host.get('mtu', profile.get('mtu'))
+    vlan = host.get('vlan', profile.get('vlan'))
+    address = [{'ip': host['ip'], 'prefix-length': int(host['prefix'])}]
+    interfaces = [{'name': name, 'macAddress': mac} for name, mac in zip(ports, macs)]
+
+    base = {'state': 'up', 'mac-address': macs[0], 'ipv6': {'enabled': 'false'}}
+    if mtu:
+        base['mtu'] = int(mtu)
+    if profile.get('type') == 'bond':
+        base.update({'name': profile.get('name', 'bond0'), 'type': 'bond',
+                     'link-aggregation': {'mode': profile.get('mode', 'active-backup'),
+                                          'options': {'miimon': str(profile.get('miimon', 100))},
+                                          'port': ports}})
+    else:
+        base.update({'name': ports[0], 'type': 'ethernet'})
+
+    if not vlan:
+        base['ipv4'] = {'enabled': 'true', 'address': address, 'dhcp': 'false'}
+        return interfaces, [base], base['name']
+
+    base['ipv4'] = {'enabled': 'false', 'address': [], 'dhcp': 'false'}
+    vlan_iface = {'name': f"{base['name']}.{vlan}", 'type': 'vlan', 'state': 'up',
+                  'vlan': {'base-iface': base['name'], 'id': int(vlan)},
+                  'ipv4': {'enabled': 'true', 'address': address, 'dhcp': 'false'},
+                  'ipv6': {'enabled': 'false'}}
+    if mtu:
+        vlan_iface['mtu'] = int(mtu)
+    return interfaces, [base, vlan_iface], vlan_iface['name']
+
+
+def _root_device_hints(hostname, hints, errors):
+    """
+    root device hint의 키와 값 타입을 검증하고 agent-config에 쓸 값으로 변환합니다.
+    (YAML에서 숫자로 읽힌 serialNumber 등은 문자열로, 'true'/'false' 문자열은 bool로 바꿉니다)
+    """
+    converted = {}
+    for key, value in hints.items():
+        kind = ROOT_DEVICE_HINTS.get(key)
+        if kind is None:
+            errors.append(f"{hostname}: 지원하지 않는 root device hint '{key}' ({', '.join(ROOT_DEVICE_HINTS)})")
+        elif kind is bool:
+            if isinstance(value, str) and value.lower() in ('true', 'false'):
+                value = value.lower() == 'true'
+            if not isinstance(value, bool):
+                errors.append(f"{hostname}: root device hint '{key}'는 true/false여야 합니다.")
+            converted[key] = value
+        elif kind is int:
+            if isinstance(value, str) and value.strip().isdigit():
+                value = int(value)
+            if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+                errors.append(f"{hostname}: root device hint '{key}'는 양의 정수여야 합니다.")
+            converted[key] = value
+        elif key == 'wwn' and not isinstance(value, str):
+            # 따옴표 없는 0x... 값은 YAML에서 정수로 읽혀 원래 표기를 잃으므로 문자열 입력을 요구합니다.
+            errors.append(f"{hostname}: root device hint 'wwn'은 따옴표로 감싸 입력하세요. ('0x5000c500a1b2c3d4')")
+        elif isinstance(value, (str, int)) and not isinstance(value, bool) and str(value).strip():
+            converted[key] = str(value).strip()
+        else:
+            errors.append(f"{hostname}: root device hint '{key}' 값이 올바르지 않습니다.")
+    return converted
+
+
+def build_hosts(inventory, cluster_domain, machine_network=None):
+    """
+    인벤토리를 agent-config 노드 목록으로 변환하고 검증합니다.
+    MAC/IP/hostname 중복은 dict 인덱스로 한 번의 순회(O(n))에서 검사하며,
+    오류가 있으면 모든 오류를 모아 InventoryError로 던집니다.
+    """
+    defaults = inventory.get('defaults') or {}
+    profiles = {**DEFAULT_PROFILES, **(inventory.get('profiles') or {})}
+    role_profiles = {**DEFAULT_ROLE_PROFILES, **(inventory.get('role_profiles') or {})}
+    network = ipaddress.ip_network(machine_network, strict=False) if machine_network else None
+
+    errors, nodes = [], []
+    seen_hostnames, seen_macs, seen_ips = {}, {}, {}
+
+    for index, raw in enumerate(inventory.get('hosts') or [], start=1):
+        host = {**defaults, **raw}
+        missing = [key for key in ('hostname', 'role', 'ip', 'prefix') if not host.get(key)]
+        if missing:
+            errors.append(f"{index}번째 호스트: 필수 항목 누락 ({', '.join(missing)})")
+            continue
+
+        hostname = str(host['hostname'])
+        fqdn = hostname if '.' in hostname else f"{hostname}.{cluster_domain}"
+        role = str(host['role']).lower()
+        if role not in ROLES:
+            errors.append(f"{hostname}: 알 수 없는 역할 '{role}' (master/worker/infra)")
+            continue
+        if fqdn in seen_hostnames:
+            errors.append(f"{hostname}: hostname이 {seen_hostnames[fqdn]}번째 호스트와 중복됩니다.")
+        seen_hostnames[fqdn] = index
+
+        try:
+            ip = ipaddress.ip_address(str(host['ip']))
+        except ValueError:
+            errors.append(f"{hostname}: 잘못된 IP 주소 '{host['ip']}'")
+            continue
+        if not str(host['prefix']).isdigit():
+            errors.append(f"{hostname}: 잘못된 prefix 길이 '{host['prefix']}'")
+            continue
+        if network and ip not in network:
+            errors.append(f"{hostname}: IP {ip}가 Machine Network {network}에 속하지 않습니다.")
+        if ip in seen_ips:
+            errors.append(f"{hostname}: IP {ip}가 {seen_ips[ip]}와 중복됩니다.")
+        seen_ips[ip] = hostname
+
+        raw_macs = host.get('macs', host.get('mac'))
+        if raw_macs is not None and not isinstance(raw_macs, (str, list, tuple)) or \
+                (isinstance(raw_macs, (list, tuple)) and not all(isinstance(m, str) for m in raw_macs)):
+            errors.append(f"{hostname}: MAC 주소는 문자열이어야 합니다. 따옴표로 감싸 입력하세요. ('52:54:00:11:22:33')")
+            continue
+        macs = [m.lower().replace('-', ':') for m in _split(raw_macs)]
+        for mac in macs:
+            if not MAC_PATTERN.match(mac):
+                errors.append(f"{hostname}: 잘못된 MAC 주소 '{mac}'")
+            elif mac in seen_macs:
+                errors.append(f"{hostname}: MAC {mac}가 {seen_macs[mac]}와 중복됩니다.")
+            else:
+                seen_macs[mac] = hostname
+
+        profile_name = host.get('profile') or role_profiles.get(role)
+        profile = profiles.get(profile_name)
+        if profile is None:
+            errors.append(f"{hostname}: 정의되지 않은 NIC 프로파일 '{profile_name}'")
+            continue
+
+        vlan = host.get('vlan', profile.get('vlan'))
+        if vlan not in (None, '') and not (str(vlan).isdigit() and 1 <= int(vlan) <= 4094):
+            errors.append(f"{hostname}: 잘못된 VLAN ID '{vlan}' (1~4094)")
+            continue
+        mtu = host.get('mtu', profile.get('mtu'))
+        if mtu not in (None, '') and not (str(mtu).isdigit() and 576 <= int(mtu) <= 9216):
+            errors.append(f"{hostname}: 잘못된 MTU '{mtu}' (576~9216)")
+            continue
+        hints = host.get('root_device_hints') or {}
+        if not isinstance(hints, dict):
+            errors.append(f"{hostname}: root_device_hints는 key: value 형식이어야 합니다.")
+            continue
+        hint_errors = len(errors)
+        hints = _root_device_hints(hostname, hints, errors)
+        if len(errors) > hint_errors:
+            continue
+
+        interfaces, network_interfaces, route_iface = _interfaces_for(host, profile, macs, errors)
+        if not network_interfaces:
+            continue
+
+        if host.get('root_device'):
+            hints = {'deviceName': str(host['root_device'])}
+        node = {
+            # agent-config의 role은 master/worker만 허용하므로 infra 노드는 worker로 설치합니다.
+            'role': 'master' if role == 'master' else 'worker',
+            'hostname': fqdn,
+            'rootDeviceHints': hints,
+            'interfaces': interfaces,
+            'networkConfig': {'interfaces': network_interfaces},
+        }
+        if host.get('gateway'):
+            node['networkConfig']['routes'] = {'config': [{
+                'destination': '0.0.0.0/0',
+                'next-hop-address': host['gateway'],
+                'next-hop-interface': route_iface,
+                'table-id': 254,
+            }]}
+        dns = _split(host.get('dns'))
+        if dns:
+            node['networkConfig']['dns-resolver'] = {'config': {'server': dns}}
+        nodes.append(node)
+
+    master_count = sum(1 for node in nodes if node['role'] == 'master')
+    if not errors and master_count not in SUPPORTED_MASTER_COUNTS:
+        # install-config의 controlPlane.replicas와 agent-config의 master 수가 같아야 설치가 진행됩니다.
+        errors.append(f"master 역할의 호스트는 {' 또는 '.join(map(str, SUPPORTED_MASTER_COUNTS))}대여야 합니다. "
+                      f"(현재 {master_count}대)")
+    if errors:
+        raise InventoryError(errors)
+    return nodes
+
+
+def rendezvous_ip(nodes):
+    """첫 번째 master 노드의 IP를 Rendezvous IP로 사용합니다."""
+    for node in nodes:
+        if node['role'] == 'master':
+            for iface in node['networkConfig']['interfaces']:
+                if iface['ipv4']['address']:
+                    return iface['ipv4']['address'][0]['ip']
+    return None
@@ -53,6 +53,12 @@ mkdir -p "$APP_BASE_DIR"
 rm -rf "$APP_TARGET_DIR"
 rsync -av "$SOURCE_DIR/" "$APP_TARGET_DIR/"
 echo "파일 복사 완료."
+# 공통 모듈(저장소 최상위 common/)을 앱 디렉터리로 복사합니다.
+SHARED_MODULES="executor.py metrics.py registry_auth.py"
+for module in $SHARED_MODULES; do
+    cp "$SOURCE_DIR/../common/$module" "$APP_TARGET_DIR/"
+done
+echo "공통 모듈 복사 완료: $SHARED_MODULES"
 echo
 
 # 3. Python 의존성 설치
@@ -94,6 +100,8 @@ cat <<EOF > /etc/sudoers.d/ocp-iso-creator
 apache ALL=(ALL) NOPASSWD: /usr/bin/hostnamectl
 apache ALL=(ALL) NOPASSWD: /usr/bin/nmcli
 apache ALL=(ALL) NOPASSWD: /usr/bin/systemctl
+apache ALL=(ALL) NOPASSWD: /usr/bin/nsupdate
+apache ALL=(ALL) NOPASSWD: /usr/sbin/rndc
 apache ALL=(ALL) NOPASSWD: /usr/bin/cp
 apache ALL=(ALL) NOPASSWD: /usr/bin/mv
 apache ALL=(ALL) NOPASSWD: /usr/bin/rm
@@ -154,6 +162,8 @@ chcon -R -t httpd_sys_content_t "$APP_TARGET_DIR"
 setsebool -P httpd_can_network_connect 1
 setsebool -P httpd_manage_ipa 1
 setsebool -P haproxy_connect_any=1
+# named가 동적 업데이트(nsupdate) 결과를 zone 파일/저널에 기록할 수 있도록 허용
+setsebool -P named_write_master_zones 1
 echo "SELinux 컨텍스트 설정 완료."
 echo
 
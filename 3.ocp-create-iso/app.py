@@ -1,12 +1,20 @@
 import os
 import json
-import subprocess
+import sys
 import shutil
+import tempfile
 from flask import Flask, render_template, request, jsonify, render_template_string
 from io import StringIO
 import csv
+import fcntl
 import glob
-import shlex
+# 저장소에서 바로 실행할 때는 최상위 common/의 공통 모듈을 사용합니다. (배포 시에는 배포 스크립트가 앱 디렉터리로 복사)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common'))
+import dns_zone
+import executor
+import haproxy_runtime
+import metrics
+import registry_auth
 
 # --- 기본 설정 ---
 app = Flask(__name__)
@@ -21,18 +29,23 @@ MIRROR_IMAGES_DIR = os.path.join(OC_MIRROR_BASE_DIR, "mirror-images")
 ISO_CREATE_DIR = os.path.join(BASE_DIR, "create-iso")
 QUAY_ROOT = "/opt/openshift/init-quay"
 APACHE_HOME_DIR = "/usr/share/httpd"
+HAPROXY_CFG_PATH = "/etc/haproxy/haproxy.cfg"
+HAPROXY_STATE_PATH = os.path.join(os.path.dirname(SHARED_DATA_PATH), "haproxy_state.json")
+HAPROXY_STATE_LOCK_PATH = f"{HAPROXY_STATE_PATH}.lock"
+MIRROR_PUSH_LOG_PATH = os.path.join(executor.LOG_DIR, "oc-mirror-push.log")
+MIRROR_PUSH_JOB_PATH = os.path.join(executor.LOG_DIR, "oc-mirror-push.job.json")
+INSTALL_WAIT_LOG_PATH = os.path.join(executor.LOG_DIR, "install-wait.log")
+INSTALL_WAIT_JOB_PATH = os.path.join(executor.LOG_DIR, "install-wait.job.json")
+REQUEST_COMMAND_TIMEOUT = 1100  # gunicorn --timeout(1200초)보다 짧게 유지
 
 # --- Helper 함수 ---
-def run_command(command, capture_output=True):
-    """지정된 셸 명령어를 실행하고 결과를 반환합니다."""
-    try:
-        result = subprocess.run(
-            command, shell=True, check=True,
-            capture_output=capture_output, text=True, executable='/bin/bash'
-        )
-        return {"success": True, "output": result.stdout, "error": result.stderr}
-    except subprocess.CalledProcessError as e:
-        return {"success": False, "output": e.stdout, "error": e.stderr}
+def run_command(argv, **kwargs):
+    """argv 목록으로 명령을 실행하고 결과를 반환합니다. (셸을 거치지 않음)"""
+    return executor.run(argv, **kwargs)
+
+def run_commands(*commands, **kwargs):
+    """여러 명령을 순서대로 실행하고 첫 번째 실패에서 중단합니다."""
+    return executor.run_sequence(commands, **kwargs)
 
 def load_cluster_data():
     """공유 JSON 파일에서 클러스터 데이터를 로드합니다."""
@@ -46,15 +59,15 @@ def backup_file(filepath):
     """파일을 백업하고 메시지를 반환합니다."""
     if os.path.exists(filepath):
         backup_path = f"{filepath}.bak_{os.getpid()}"
-        run_command(f"sudo cp -p {filepath} {backup_path}")
+        run_command(["sudo", "cp", "-p", filepath, backup_path])
         return f"기존 파일 백업: {backup_path}"
     return "백업할 기존 파일 없음"
 
 def write_file_as_root(filepath, content):
     """파일의 '내용'을 root 권한으로 직접 써넣어 올바른 SELinux 컨텍스트를 부여합니다."""
-    escaped_content = shlex.quote(content)
-    command = f"echo {escaped_content} | sudo tee {filepath} > /dev/null"
-    return run_command(command)
+    if not content.endswith('\n'):
+        content += '\n'
+    return run_command(["sudo", "tee", filepath], input=content, stdout_path=os.devnull)
 
 def setup_directories_and_permissions():
     """필요한 모든 디렉터리를 생성하고 apache 사용자에게 소유권을 부여합니다."""
@@ -63,18 +76,219 @@ def setup_directories_and_permissions():
         dirs_to_create = [
             os.path.dirname(SHARED_DATA_PATH),
             ISO_CREATE_DIR,
+            executor.LOG_DIR,
         ]
-        for d in dirs_to_create:
-            run_command(f"sudo mkdir -p {d}")
-        
-        run_command(f"sudo chown -R apache:apache {BASE_DIR}")
-        run_command(f"sudo chown -R apache:apache {APACHE_HOME_DIR}")
+        run_command(["sudo", "mkdir", "-p", *dirs_to_create])
+        run_command(["sudo", "chown", "-R", "apache:apache", BASE_DIR, APACHE_HOME_DIR])
         print("INFO: Directory setup completed successfully.")
     except Exception as e:
         print(f"ERROR during directory setup: {e}")
 
+def read_file_as_root(filepath):
+    """
+    root 소유의 파일 내용을 읽어 반환합니다. 파일이 없으면 None을 반환합니다.
+    DNS/HAProxy 비교에 그대로 쓰이므로 링 버퍼(줄 수/줄 길이 제한)를 거치지 않고 임시 파일로 전체를 받습니다.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix='read-as-root-')
+    os.close(fd)
+    try:
+        result = run_command(["sudo", "cat", filepath], stdout_path=tmp_path)
+        if not result['success']:
+            return None
+        with open(tmp_path, encoding='utf-8') as f:
+            return f.read()
+    finally:
+        os.remove(tmp_path)
+
+def file_content_differs(filepath, content):
+    """root 소유 파일의 현재 내용이 렌더링된 내용과 다른지 확인합니다. (tee가 붙이는 개행은 무시)"""
+    current = read_file_as_root(filepath)
+    return current is None or current.rstrip('\n') != content.rstrip('\n')
+
+def render_dns_zone(template_name, data, origin, current_text):
+    """zone 템플릿을 현재 serial보다 큰 serial로 렌더링하고 (내용, 레코드 집합)을 반환합니다."""
+    current_serial = None
+    if current_text:
+        current_serial, _ = dns_zone.parse_zone(current_text, origin)
+    serial = dns_zone.next_serial(current_serial)
+    content = render_template_string(open(f'templates/{template_name}').read(), data=data, serial=serial)
+    _, records = dns_zone.parse_zone(content, origin)
+    return content, records
+
+def apply_dns_config(data):
+    """
+    named 설정과 zone 파일을 적용합니다.
+    설정 구조(named.conf, zone 선언)가 바뀌었거나 named가 실행 중이 아닐 때만 전체 파일을 쓰고 재시작하며,
+    그 외에는 실행 중인 zone과 비교하여 변경된 레코드만 nsupdate로 반영합니다. (캐시 유지, 무중단)
+    """
+    base_domain = data['base_domain']
+    rev_ip = '.'.join(data['machine_network_cidr'].split('/')[0].split('.')[:3][::-1])
+    named_conf_content = render_template_string(open('templates/named.conf.j2').read())
+    rfc1912_content = render_template_string(open('templates/named.rfc1912.zones.j2').read(), base_domain=base_domain, rev_ip=rev_ip)
+    zones = [
+        (base_domain, f"/var/named/{base_domain}.zone", 'domain.zone.j2'),
+        (f"{rev_ip}.in-addr.arpa", f"/var/named/{base_domain}.rev", 'domain.rev.j2'),
+    ]
+
+    named_active = run_command(["systemctl", "is-active", "--quiet", "named"])['success']
+    config_changed = (file_content_differs("/etc/named.conf", named_conf_content) or
+                      file_content_differs("/etc/named.rfc1912.zones", rfc1912_content))
+
+    rendered = []
+    for origin, path, template_name in zones:
+        current_text = read_file_as_root(path)
+        content, records = render_dns_zone(template_name, data, origin, current_text)
+        rendered.append((origin, path, current_text, content, records))
+
+    # 1) 최초 구성 또는 구조 변경: 전체 파일을 쓰고 named를 재시작합니다.
+    if not named_active or config_changed or any(r[2] is None for r in rendered):
+        run_command(["sudo", "systemctl", "stop", "named"])
+        backup_file("/etc/named.conf")
+        write_file_as_root("/etc/named.conf", named_conf_content)
+        backup_file("/etc/named.rfc1912.zones")
+        write_file_as_root("/etc/named.rfc1912.zones", rfc1912_content)
+        for _, path, _, content, _ in rendered:
+            backup_file(path)
+            write_file_as_root(path, content)
+            # 이전 동적 업데이트 저널은 새 zone 파일과 맞지 않으므로 제거합니다.
+            run_command(["sudo", "rm", "-f", f"{path}.jnl"])
+        zone_paths = [r[1] for r in rendered]
+        run_command(["sudo", "chown", "root:named", *zone_paths])
+        run_command(["sudo", "restorecon", "/etc/named.conf", "/etc/named.rfc1912.zones"])
+        run_command(["sudo", "restorecon", "-v", *zone_paths])
+        return run_commands(["sudo", "systemctl", "enable", "named"], ["sudo", "systemctl", "restart", "named"])
+
+    # 2) 레코드 변경: 변경분만 동적 업데이트로 반영하고 zone 파일에 동기화합니다.
+    messages = []
+    for origin, path, current_text, content, records in rendered:
+        _, current_records = dns_zone.parse_zone(current_text, origin)
+        removed, added = dns_zone.diff_records(current_records, records)
+        if not removed and not added:
+            messages.append(f"{origin}: 변경 사항 없음")
+            continue
+        script = dns_zone.build_nsupdate_script(origin, removed, added)
+        result = run_command(["sudo", "nsupdate", "-l"], input=script)
+        if result['success']:
+            result = run_command(["sudo", "rndc", "sync", "-clean", origin])
+        else:
+            # 동적 업데이트가 불가능하면 해당 zone만 파일 교체 후 다시 읽어들입니다.
+            backup_file(path)
+            run_command(["sudo", "rndc", "freeze", origin])
+            write_file_as_root(path, content)
+            run_command(["sudo", "chown", "root:named", path])
+            run_command(["sudo", "restorecon", "-v", path])
+            result = run_command(["sudo", "rndc", "thaw", origin])
+        if not result['success']:
+            return {"success": False, "output": '\n'.join(messages), "error": f"{origin} 적용 실패: {result['error']}"}
+        messages.append(f"{origin}: 레코드 {len(added)}개 추가, {len(removed)}개 삭제")
+    return {"success": True, "output": '\n'.join(messages), "error": ""}
+
+def load_haproxy_state():
+    """Runtime API로 변경한 server 상태({"backend/server": {"admin", "weight"}})를 로드합니다."""
+    try:
+        with open(HAPROXY_STATE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_haproxy_state(state):
+    """임시 파일에 쓴 뒤 rename으로 교체합니다. (설정 렌더링 중에 읽어도 항상 완전한 파일을 보게 됩니다)"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(HAPROXY_STATE_PATH), prefix='.haproxy_state-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=4)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, HAPROXY_STATE_PATH)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def render_haproxy_config(data):
+    return render_template_string(open('templates/haproxy.cfg.j2').read(), data=data, server_state=load_haproxy_state())
+
+def persist_haproxy_config(content):
+    """렌더링된 설정을 haproxy.cfg에 기록합니다. (reload 하지 않음)"""
+    backup_file(HAPROXY_CFG_PATH)
+    write_file_as_root(HAPROXY_CFG_PATH, content)
+    run_command(["sudo", "restorecon", HAPROXY_CFG_PATH])
+
+def apply_haproxy_config(data):
+    """
+    haproxy.cfg를 적용합니다.
+    server 구성만 바뀐 경우 Runtime API로 server를 추가/삭제/변경하고 설정 파일에만 기록하며,
+    설정 골격이 바뀌었거나 Runtime API 적용에 실패한 경우에만 reload(무중단)합니다.
+    """
+    content = render_haproxy_config(data)
+    current = read_file_as_root(HAPROXY_CFG_PATH)
+    haproxy_active = run_command(["systemctl", "is-active", "--quiet", "haproxy"])['success']
+
+    if not haproxy_active:
+        persist_haproxy_config(content)
+        return run_command(["sudo", "systemctl", "enable", "--now", "haproxy"])
+
+    if current is not None and haproxy_runtime.structure_of(current) == haproxy_runtime.structure_of(content):
+        commands = haproxy_runtime.plan_commands(haproxy_runtime.parse_backends(current),
+                                                 haproxy_runtime.parse_backends(content))
+        if not commands:
+            persist_haproxy_config(content)
+            return {"success": True, "output": "변경 사항 없음", "error": ""}
+        ok, log = haproxy_runtime.apply_commands(commands)
+        if ok:
+            persist_haproxy_config(content)
+            return {"success": True, "output": "Runtime API로 적용 완료 (reload 없음)\n" + '\n'.join(log), "error": ""}
+        print(f"WARNING: HAProxy runtime update failed, falling back to reload: {log[-1]}")
+
+    persist_haproxy_config(content)
+    return run_commands(["sudo", "systemctl", "enable", "haproxy"], ["sudo", "systemctl", "reload", "haproxy"])
+
+def set_haproxy_server_state(data, backend, server, admin, weight=None):
+    """
+    server 하나의 상태(ready/drain/maint)와 weight를 Runtime API로 변경하고,
+    같은 상태를 haproxy_state.json과 haproxy.cfg에 반영합니다.
+    """
+    target = f"{backend}/{server}"
+    # 여러 gunicorn worker가 동시에 다른 server 상태를 바꿔도 변경이 유실되지 않도록
+    # 상태 파일 읽기-수정-쓰기와 haproxy.cfg 반영을 파일 잠금 안에서 처리합니다.
+    with open(HAPROXY_STATE_LOCK_PATH, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        state = load_haproxy_state()
+        entry = state.get(target, {})
+        commands = [f"set server {target} state {admin}"]
+        if weight is None and admin == 'ready':
+            # drain은 설정 파일에 'weight 0'으로 기록되므로, reload 이후에는 state ready만으로는
+            # 트래픽이 돌아오지 않습니다. ready로 바꿀 때는 저장된 weight(없으면 1)를 함께 복원합니다.
+            weight = entry.get('weight')
+            weight = 1 if weight is None else weight
+        if weight is not None:
+            commands.append(f"set server {target} weight {weight}")
+        ok, log = haproxy_runtime.apply_commands(commands)
+        if not ok:
+            return {"success": False, "output": '\n'.join(log), "error": f"{target} 상태 변경 실패"}
+
+        entry['admin'] = admin
+        if weight is not None:
+            entry['weight'] = weight
+        state[target] = entry
+        save_haproxy_state(state)
+        persist_haproxy_config(render_haproxy_config(data))
+    return {"success": True, "output": '\n'.join(log), "error": ""}
+
 setup_directories_and_permissions()
 
+# --- 성능 계측 (/metrics, /api/timeline) ---
+# execute-action의 type 또는 endpoint 이름 -> 설치 단계
+# 요청 시간이 곧 단계 소요 시간인 액션만 매핑합니다. oc_get_node/apply_policies는 짧은 oc 호출이므로 제외하며,
+# push/install 단계는 mirror_push/wait_install의 감시 프로세스가 직접 기록합니다.
+STAGE_MAP = {
+    'unpack_tools': 'download',
+    'mirror_install': 'registry', 'ca_trust': 'registry', 'mirror_start': 'registry',
+    'hostname': 'dns_haproxy', 'ip': 'dns_haproxy', 'dns': 'dns_haproxy',
+    'chrony': 'dns_haproxy', 'haproxy': 'dns_haproxy', 'haproxy_server': 'dns_haproxy',
+    'create_iso': 'iso',
+}
+metrics.init_app(app, 'ocp-create-iso', STAGE_MAP)
+
 # --- 기본 페이지 및 API 라우팅 ---
 @app.route('/')
 def index():
@@ -97,17 +311,18 @@ def upload_csv():
         keys = next(csv_reader)
         values = next(csv_reader)
         cluster_data = dict(zip(keys, values))
+        metrics.set_run(cluster=cluster_data.get('metadata_name'))
         
         temp_file_path = f"/tmp/cluster_info_{os.getpid()}.json"
         with open(temp_file_path, 'w', encoding='utf-8') as f:
             json.dump(cluster_data, f, indent=4, ensure_ascii=False)
 
         dest_dir = os.path.dirname(SHARED_DATA_PATH)
-        run_command(f"sudo mkdir -p {dest_dir}")
-        run_command(f"sudo mv {temp_file_path} {SHARED_DATA_PATH}")
-        run_command(f"sudo chmod 644 {SHARED_DATA_PATH}")
-        run_command(f"sudo chown apache:apache {SHARED_DATA_PATH}")
-        run_command(f"sudo restorecon -Rv {dest_dir}")
+        run_commands(["sudo", "mkdir", "-p", dest_dir],
+                     ["sudo", "mv", temp_file_path, SHARED_DATA_PATH],
+                     ["sudo", "chmod", "644", SHARED_DATA_PATH],
+                     ["sudo", "chown", "apache:apache", SHARED_DATA_PATH])
+        run_command(["sudo", "restorecon", "-Rv", dest_dir])
 
         return jsonify({"success": True, "message": f"✅ 클러스터 정보가 {SHARED_DATA_PATH}에 저장되었습니다."})
     except Exception as e:
@@ -123,19 +338,20 @@ def execute_action():
 
     # 필수 명령어 준비 액션
     if action_type == 'unpack_tools':
-        cmd1 = f"sudo tar --overwrite -xzf {INSTALL_AGENT_DIR}/openshift-install-linux.tar.gz -C /usr/local/bin/"
-        cmd2 = f"sudo tar --overwrite -xzf {INSTALL_AGENT_DIR}/openshift-client-linux.tar.gz -C /usr/local/bin/"
-        cmd3 = f"sudo cp {OC_MIRROR_BASE_DIR}/mirror-registry/mirror-registry /usr/local/bin/"
-        cmd4 = f"sudo tar --overwrite -xzf {OC_MIRROR_BASE_DIR}/oc-mirror.tar.gz -C /usr/local/bin/ && sudo chmod 755 /usr/local/bin/oc-mirror"
-        cmd5 = f"sudo tar --overwrite -xzf {OC_MIRROR_BASE_DIR}/helm/helm-linux-amd64.tar.gz -C /usr/local/bin/"
-        cmd6 = f"sudo tar --overwrite -xzf {OC_MIRROR_BASE_DIR}/tekton/tkn-linux-amd64.tar.gz -C /usr/local/bin/"
-        full_command = f"{cmd1} && {cmd2} && {cmd3} && {cmd4} && {cmd5} && {cmd6}"
-        return jsonify(run_command(full_command))
+        return jsonify(run_commands(
+            ["sudo", "tar", "--overwrite", "-xzf", f"{INSTALL_AGENT_DIR}/openshift-install-linux.tar.gz", "-C", "/usr/local/bin/"],
+            ["sudo", "tar", "--overwrite", "-xzf", f"{INSTALL_AGENT_DIR}/openshift-client-linux.tar.gz", "-C", "/usr/local/bin/"],
+            ["sudo", "cp", f"{OC_MIRROR_BASE_DIR}/mirror-registry/mirror-registry", "/usr/local/bin/"],
+            ["sudo", "tar", "--overwrite", "-xzf", f"{OC_MIRROR_BASE_DIR}/oc-mirror.tar.gz", "-C", "/usr/local/bin/"],
+            ["sudo", "chmod", "755", "/usr/local/bin/oc-mirror"],
+            ["sudo", "tar", "--overwrite", "-xzf", f"{OC_MIRROR_BASE_DIR}/helm/helm-linux-amd64.tar.gz", "-C", "/usr/local/bin/"],
+            ["sudo", "tar", "--overwrite", "-xzf", f"{OC_MIRROR_BASE_DIR}/tekton/tkn-linux-amd64.tar.gz", "-C", "/usr/local/bin/"],
+        ))
 
     # --- Section 2 Actions ---
     if action_type == 'hostname':
         hostname = f"{data['hostname_bastion']}.{data['metadata_name']}.{data['base_domain']}"
-        return jsonify(run_command(f"sudo hostnamectl set-hostname {hostname}"))
+        return jsonify(run_command(["sudo", "hostnamectl", "set-hostname", hostname]))
     
     if action_type == 'ip':
         ip = data['nodeip_bastion']
@@ -144,119 +360,106 @@ def execute_action():
         dns = data['nodeip_bastion']
         search_domain = f"{data['metadata_name']}.{data['base_domain']}"
         interface_name = data.get('interface_bastion', 'eth0')
-        command = (f"sudo nmcli connection modify {interface_name} ipv4.method manual ipv4.addresses {ip}/{prefix} ipv4.gateway {gateway} ipv4.dns {dns} ipv4.dns-search {search_domain} && sudo nmcli connection up {interface_name}")
-        return jsonify(run_command(command))
+        return jsonify(run_commands(
+            ["sudo", "nmcli", "connection", "modify", interface_name, "ipv4.method", "manual",
+             "ipv4.addresses", f"{ip}/{prefix}", "ipv4.gateway", gateway, "ipv4.dns", dns, "ipv4.dns-search", search_domain],
+            ["sudo", "nmcli", "connection", "up", interface_name],
+        ))
 
     if action_type == 'dns':
-        backup_file("/etc/named.conf")
-        named_conf_content = render_template_string(open('templates/named.conf.j2').read())
-        write_file_as_root("/etc/named.conf", named_conf_content)
-        backup_file("/etc/named.rfc1912.zones")
-        rev_ip = '.'.join(data['machine_network_cidr'].split('/')[0].split('.')[:3][::-1])
-        rfc1912_content = render_template_string(open('templates/named.rfc1912.zones.j2').read(), base_domain=data['base_domain'], rev_ip=rev_ip)
-        write_file_as_root("/etc/named.rfc1912.zones", rfc1912_content)
-        zone_file_path = f"/var/named/{data['base_domain']}.zone"
-        rev_file_path = f"/var/named/{data['base_domain']}.rev"
-        zone_content = render_template_string(open('templates/domain.zone.j2').read(), data=data)
-        write_file_as_root(zone_file_path, zone_content)
-        rev_content = render_template_string(open('templates/domain.rev.j2').read(), data=data)
-        write_file_as_root(rev_file_path, rev_content)
-        run_command(f"sudo chown root:named {zone_file_path} {rev_file_path}")
-        run_command(f"sudo restorecon /etc/named.conf /etc/named.rfc1912.zones")
-        run_command(f"sudo restorecon -v /var/named/{data['base_domain']}.*")
-        return jsonify(run_command("sudo systemctl enable named && sudo systemctl restart named"))
+        return jsonify(apply_dns_config(data))
 
     if action_type == 'chrony':
         backup_file("/etc/chrony.conf")
         chrony_content = render_template_string(open('templates/chrony.conf.j2').read(), machine_network_cidr=data['machine_network_cidr'])
         write_file_as_root("/etc/chrony.conf", chrony_content)
-        run_command("sudo restorecon /etc/chrony.conf")
-        return jsonify(run_command("sudo systemctl enable --now chronyd && sudo systemctl restart chronyd"))
+        run_command(["sudo", "restorecon", "/etc/chrony.conf"])
+        return jsonify(run_commands(["sudo", "systemctl", "enable", "--now", "chronyd"], ["sudo", "systemctl", "restart", "chronyd"]))
 
     if action_type == 'haproxy':
-        backup_file("/etc/haproxy/haproxy.cfg")
-        haproxy_content = render_template_string(open('templates/haproxy.cfg.j2').read(), data=data)
-        write_file_as_root("/etc/haproxy/haproxy.cfg", haproxy_content)
-        run_command("sudo restorecon /etc/haproxy/haproxy.cfg")
-        return jsonify(run_command("sudo systemctl enable --now haproxy && sudo systemctl restart haproxy"))
+        return jsonify(apply_haproxy_config(data))
 
     # --- Section 3 Actions ---
     if action_type == 'mirror_install':
-        cmd = (f"sudo /usr/local/bin/mirror-registry install --initUser {data['local_registry_user']} "
-               f"--initPassword {data['local_registry_password']} --quayHostname {data['local_registry']} "
-               f"--quayRoot {QUAY_ROOT}  -v")
-        return jsonify(run_command(cmd))
+        cmd = ["sudo", "/usr/local/bin/mirror-registry", "install", "--initUser", data['local_registry_user'],
+               "--initPassword", data['local_registry_password'], "--quayHostname", data['local_registry'],
+               "--quayRoot", QUAY_ROOT, "-v"]
+        return jsonify(run_command(cmd, timeout=REQUEST_COMMAND_TIMEOUT, redact=[data['local_registry_password']]))
 
     if action_type == 'ca_trust':
-        cmd = (f"sudo cp -f {QUAY_ROOT}/quay-rootCA/rootCA.pem /etc/pki/ca-trust/source/anchors/ && sudo cp -f {QUAY_ROOT}/quay-config/ssl.cert /etc/pki/ca-trust/source/anchors/ && sudo update-ca-trust")
-        return jsonify(run_command(cmd))
+        return jsonify(run_commands(
+            ["sudo", "cp", "-f", f"{QUAY_ROOT}/quay-rootCA/rootCA.pem", "/etc/pki/ca-trust/source/anchors/"],
+            ["sudo", "cp", "-f", f"{QUAY_ROOT}/quay-config/ssl.cert", "/etc/pki/ca-trust/source/anchors/"],
+            ["sudo", "update-ca-trust"],
+        ))
     
     if action_type == 'get_ca_cert':
         ca_path = f"{QUAY_ROOT}/quay-rootCA/rootCA.pem"
         if not os.path.exists(ca_path):
             return jsonify({"success": False, "error": "rootCA.pem 파일을 찾을 수 없습니다."})
-        result = run_command(f"sudo cat {ca_path}")
+        result = run_command(["sudo", "cat", ca_path])
         return jsonify(result)
 
     if action_type == 'mirror_start':
-        return jsonify(run_command("sudo systemctl enable --now quay-pod.service"))
+        return jsonify(run_command(["sudo", "systemctl", "enable", "--now", "quay-pod.service"]))
 
     if action_type == 'registry_auth':
-        # [수정] 명령어 문자열을 생성하여 반환
-        user = data['local_registry_user']
-        password = data['local_registry_password']
-        registry = data['local_registry']
-
-        auth_command = f"echo -n '{user}:{password}' | base64 -w0"
-        auth_result = run_command(auth_command)
-        if not auth_result['success']:
-            return jsonify({"success": False, "error": f"auth 문자열 생성 실패: {auth_result['error']}"})
-        auth_string = auth_result['output'].strip()
-
-        config_json = {"auths": {registry: {"auth": auth_string}}}
-        config_content = json.dumps(config_json, indent=4)
-        
-        command_to_run = (
-            "mkdir -p ~/.docker && \\\n"
-            f"echo '{config_content}' > ~/.docker/config.json"
-        )
-        
-        return jsonify({
-            "success": True,
-            "is_command": True, # JS에서 이 값을 확인
-            "message": "root 로 Bastion에서 해당 명령어를 복사/붙여넣기로 수행하세요.",
-            "output": command_to_run
-        })
+        # 로컬 registry 계정을 pull secret과 같은 인증 파일에 병합합니다. (base64 인코딩도 프로세스 안에서 처리)
+        try:
+            auths = registry_auth.add_registry(data['local_registry'], data['local_registry_user'],
+                                               data['local_registry_password'])
+        except (OSError, registry_auth.AuthError) as e:
+            return jsonify({"success": False, "error": f"인증 파일 갱신 실패: {e}"})
+        return jsonify({"success": True,
+                        "message": f"{data['local_registry']} 인증 정보를 {registry_auth.AUTH_FILE_PATH}에 반영했습니다. "
+                                   f"(registry {len(auths)}개)"})
 
     if action_type == 'mirror_push':
-        # [수정] 명령어 문자열을 생성하여 반환
-        command_to_run = (
-            f"oc mirror -c {MIRROR_CONFIG_FILE} "
-            f"--from=file://{MIRROR_IMAGES_DIR} "
-            f"docker://{data['local_registry']} --v2"
-        )
-        return jsonify({
-            "success": True,
-            "is_command": True,
-            "message": "root 로 Bastion에서 해당 명령어를 복사/붙여넣기로 수행하세요.",
-            "output": command_to_run
-        })
+        missing = registry_auth.missing_registries(data['local_registry'])
+        if missing:
+            return jsonify({"success": False, "error": f"{missing[0]} 인증 정보가 없습니다. 먼저 'auth 정보 지정'을 실행하세요."})
+        cmd = ["oc", "mirror", "--authfile", registry_auth.AUTH_FILE_PATH, "-c", MIRROR_CONFIG_FILE,
+               f"--from=file://{MIRROR_IMAGES_DIR}", f"docker://{data['local_registry']}", "--v2"]
+        try:
+            # push는 수십 분 이상 걸리므로 worker와 분리하여 실행하고, 종료 시 감시 프로세스가
+            # 작업 파일과 타임라인('push' 단계)에 결과를 남깁니다.
+            job = executor.start_detached(cmd, MIRROR_PUSH_JOB_PATH, MIRROR_PUSH_LOG_PATH,
+                                          env=registry_auth.command_env(),
+                                          event=metrics.job_event('push', 'mirror_push'),
+                                          event_path=metrics.TIMELINE_PATH)
+        except OSError as e:
+            return jsonify({"success": False, "error": f"이미지 push 시작 실패: {e}"})
+        if job is None:
+            return jsonify({"success": False, "error": f"이미 이미지 push가 실행 중입니다. 진행 상황은 {MIRROR_PUSH_LOG_PATH}에서 확인하세요."})
+        return jsonify({"success": True, "message": f"이미지 push를 백그라운드로 시작했습니다. 진행 상황은 {MIRROR_PUSH_LOG_PATH}에서 확인하세요."})
 
     # --- Section 5 & 6 Actions ---
     if action_type == 'create_iso':
-        run_command(f"sudo rm -f /ocp_install/create-iso/.openshift_install*")
-        run_command(f"sudo rm -rf /ocp_install/create-iso/")
-        run_command(f"sudo mkdir -p {ISO_CREATE_DIR}")
-        run_command(f"sudo cp {PREV_APP_CONFIG_DIR}/install-config.yaml {ISO_CREATE_DIR}/")
-        run_command(f"sudo cp {PREV_APP_CONFIG_DIR}/agent-config.yaml {ISO_CREATE_DIR}/")
-        run_command(f"sudo chown -R apache:apache {ISO_CREATE_DIR}")
+        # 디렉터리 전체를 지우므로 .openshift_install* 상태 파일도 함께 제거됩니다.
+        run_commands(["sudo", "rm", "-rf", ISO_CREATE_DIR],
+                     ["sudo", "mkdir", "-p", ISO_CREATE_DIR],
+                     ["sudo", "cp", f"{PREV_APP_CONFIG_DIR}/install-config.yaml", f"{PREV_APP_CONFIG_DIR}/agent-config.yaml", f"{ISO_CREATE_DIR}/"],
+                     ["sudo", "chown", "-R", "apache:apache", ISO_CREATE_DIR])
 #        run_command(f"sudo mkdir {ISO_CREATE_DIR}/manifests/")
 #        run_command(f"sudo cp /ocp_install/oc-mirror/mirror-images/working-dir/cluster-resources/idms-oc-mirror.yaml {ISO_CREATE_DIR}/manifests/")
 #        run_command(f"sudo cp /ocp_install/oc-mirror/mirror-images/working-dir/cluster-resources/itms-oc-mirror.yaml {ISO_CREATE_DIR}/manifests/")
 #        run_command(f"sudo cp /ocp_install/oc-mirror/mirror-images/working-dir/cluster-resources/signature-configmap.yaml {ISO_CREATE_DIR}/manifests/")
 #        run_command(f"sudo cp /ocp_install/oc-mirror/mirror-images/working-dir/cluster-resources/updateService.yaml {ISO_CREATE_DIR}/manifests/")
-        cmd = f"openshift-install agent create image --dir={ISO_CREATE_DIR}"
-        return jsonify(run_command(cmd))
+        cmd = ["openshift-install", "agent", "create", "image", f"--dir={ISO_CREATE_DIR}"]
+        return jsonify(run_command(cmd, timeout=REQUEST_COMMAND_TIMEOUT))
+
+    if action_type == 'wait_install':
+        # 설치 완료까지 수십 분이 걸리므로 worker와 분리하여 실행하고, 끝나면 감시 프로세스가 'install' 단계 소요 시간을 기록합니다.
+        cmd = ["openshift-install", "agent", "wait-for", "install-complete", f"--dir={ISO_CREATE_DIR}"]
+        try:
+            job = executor.start_detached(cmd, INSTALL_WAIT_JOB_PATH, INSTALL_WAIT_LOG_PATH,
+                                          event=metrics.job_event('install', 'wait_install'),
+                                          event_path=metrics.TIMELINE_PATH)
+        except OSError as e:
+            return jsonify({"success": False, "error": f"설치 완료 대기 시작 실패: {e}"})
+        if job is None:
+            return jsonify({"success": False, "error": f"이미 설치 완료 대기가 실행 중입니다. 진행 상황은 {INSTALL_WAIT_LOG_PATH}에서 확인하세요."})
+        return jsonify({"success": True, "message": f"설치 완료 대기를 백그라운드로 시작했습니다. 진행 상황은 {INSTALL_WAIT_LOG_PATH}에서 확인하세요."})
 
     if action_type == 'oc_login':
         kubeconfig_path = f"{ISO_CREATE_DIR}/auth/kubeconfig"
@@ -264,19 +467,51 @@ def execute_action():
 
     if action_type == 'oc_get_node':
         kubeconfig_path = f"{ISO_CREATE_DIR}/auth/kubeconfig"
-        return jsonify(run_command(f"export KUBECONFIG={kubeconfig_path} && oc get node"))
+        return jsonify(run_command(["oc", "get", "node"], env={"KUBECONFIG": kubeconfig_path}))
 
     if action_type == 'apply_policies':
-        cmd1 = f"export KUBECONFIG={ISO_CREATE_DIR}/auth/kubeconfig && oc patch configs.imageregistry.operator.openshift.io cluster --type merge --patch '{{\"spec\":{{\"managementState\": \"Managed\"}}}}'"
-        cmd2 = f"export KUBECONFIG={ISO_CREATE_DIR}/auth/kubeconfig && oc patch OperatorHub cluster --type json -p '[{{\"op\": \"add\", \"path\": \"/spec/disableAllDefaultSources\", \"value\": true}}]'"
         yaml_files_path = '/ocp_install/oc-mirror/mirror-images/working-dir/cluster-resources'
-        cmd3 = f"export KUBECONFIG={ISO_CREATE_DIR}/auth/kubeconfig && oc apply -f {yaml_files_path}"
-        full_command = f"{cmd1} && {cmd2} && {cmd3}"
-        return jsonify(run_command(full_command))
+        return jsonify(run_commands(
+            ["oc", "patch", "configs.imageregistry.operator.openshift.io", "cluster", "--type", "merge",
+             "--patch", json.dumps({"spec": {"managementState": "Managed"}})],
+            ["oc", "patch", "OperatorHub", "cluster", "--type", "json",
+             "-p", json.dumps([{"op": "add", "path": "/spec/disableAllDefaultSources", "value": True}])],
+            ["oc", "apply", "-f", yaml_files_path],
+            env={"KUBECONFIG": f"{ISO_CREATE_DIR}/auth/kubeconfig"},
+        ))
 
     return jsonify({"success": False, "error": "알 수 없는 액션 타입입니다."})
 
 
+@app.route('/api/haproxy-server', methods=['POST'])
+def haproxy_server():
+    """HAProxy backend server를 재시작 없이 ready/drain/maint 상태로 전환하거나 weight를 변경합니다."""
+    data = load_cluster_data()
+    if not data:
+        return jsonify({"success": False, "error": "클러스터 정보(cluster_info.json)가 없습니다. 먼저 CSV를 업로드하세요."})
+    body = request.json
+    backend, server, admin = body.get('backend'), body.get('server'), body.get('state', 'ready')
+    if not backend or not server:
+        return jsonify({"success": False, "error": "backend와 server 이름이 필요합니다."})
+    if admin not in ('ready', 'drain', 'maint'):
+        return jsonify({"success": False, "error": f"알 수 없는 상태입니다: {admin}"})
+    # admin 권한 stats socket은 ';'와 개행을 명령 구분자로 해석하므로,
+    # 입력값을 그대로 명령에 넣지 않고 현재 설정에 실제로 존재하는 backend/server만 허용합니다.
+    backends = haproxy_runtime.parse_backends(render_haproxy_config(data))
+    if server not in backends.get(backend, {}):
+        return jsonify({"success": False, "error": f"설정에 없는 backend/server 입니다: {backend}/{server}"})
+    weight = body.get('weight')
+    if weight not in (None, ''):
+        try:
+            weight = int(weight)
+        except ValueError:
+            return jsonify({"success": False, "error": "weight는 0~256 사이의 정수여야 합니다."})
+        if not 0 <= weight <= 256:
+            return jsonify({"success": False, "error": "weight는 0~256 사이의 정수여야 합니다."})
+    else:
+        weight = None
+    return jsonify(set_haproxy_server_state(data, backend, server, admin, weight))
+
 
 # --- 애플리케이션 실행 ---
 if __name__ == '__main__':
@@ -0,0 +1,135 @@
+import re
+import time
+
+# --- Zone 파일 파싱 / 비교 헬퍼 ---
+# named가 읽는 zone 파일 텍스트를 레코드 집합으로 변환하고, 두 집합을 비교하여
+# nsupdate 스크립트를 만들어 냅니다. 실제 명령 실행은 app.py에서 담당합니다.
+
+TTL_UNITS = {'S': 1, 'M': 60, 'H': 3600, 'D': 86400, 'W': 604800}
+# 동적 업데이트로 직접 다루지 않는 레코드 타입 (SOA serial은 named가 자동 증가시킵니다)
+UNMANAGED_TYPES = {'SOA'}
+RECORD_CLASSES = {'IN', 'CH', 'HS'}
+
+
+def parse_ttl(value):
+    """'86400', '10M', '1h30m' 형식의 TTL 값을 초 단위 정수로 변환합니다."""
+    value = value.strip().upper()
+    if value.isdigit():
+        return int(value)
+    parts = re.findall(r'(\d+)([SMHDW])', value)
+    if not parts or ''.join(n + u for n, u in parts) != value:
+        raise ValueError(f"잘못된 TTL 값: {value}")
+    return sum(int(n) * TTL_UNITS[u] for n, u in parts)
+
+
+def _is_ttl(token):
+    try:
+        parse_ttl(token)
+        return True
+    except ValueError:
+        return False
+
+
+def _absolute(name, origin):
+    if name == '@':
+        return origin
+    if name.endswith('.'):
+        return name.lower()
+    if origin == '.':
+        return f"{name}.".lower()
+    return f"{name}.{origin}".lower()
+
+
+def _logical_lines(text):
+    """주석을 제거하고 괄호로 묶인 여러 줄을 하나의 논리 행으로 합칩니다."""
+    buffer, depth, starts_blank = [], 0, False
+    for raw in text.splitlines():
+        line = raw.split(';', 1)[0].rstrip()
+        if not line.strip():
+            continue
+        if depth == 0:
+            starts_blank = line[0] in ' \t'
+            buffer = []
+        depth += line.count('(') - line.count(')')
+        buffer.append(line.replace('(', ' ').replace(')', ' '))
+        if depth <= 0:
+            depth = 0
+            yield starts_blank, ' '.join(buffer).split()
+
+
+def parse_zone(text, origin):
+    """
+    zone 파일 텍스트를 파싱합니다.
+    (serial, records)를 반환하며 records는 (이름, 타입, rdata) -> TTL 형태의 딕셔너리입니다.
+    """
+    origin = origin.rstrip('.').lower() + '.'
+    default_ttl = 86400
+    last_owner = origin
+    serial = None
+    records = {}
+
+    for starts_blank, tokens in _logical_lines(text):
+        if tokens[0].upper() == '$TTL':
+            default_ttl = parse_ttl(tokens[1])
+            continue
+        if tokens[0].upper() == '$ORIGIN':
+            origin = _absolute(tokens[1], origin)
+            continue
+
+        if starts_blank:
+            owner = last_owner
+        else:
+            owner = _absolute(tokens.pop(0), origin)
+        last_owner = owner
+
+        ttl = default_ttl
+        # 이름 뒤의 TTL과 클래스는 순서에 관계없이 올 수 있습니다.
+        while tokens and (tokens[0].upper() in RECORD_CLASSES or _is_ttl(tokens[0])):
+            token = tokens.pop(0)
+            if token.upper() not in RECORD_CLASSES:
+                ttl = parse_ttl(token)
+        if not tokens:
+            continue
+
+        rtype = tokens[0].upper()
+        rdata = [t.lower() for t in tokens[1:]]
+        if rtype == 'SOA':
+            serial = int(rdata[2])
+            continue
+        records[(owner, rtype, ' '.join(rdata))] = ttl
+
+    return serial, records
+
+
+def next_serial(current_serial, today=None):
+    """
+    YYYYMMDDnn 형식의 다음 serial을 계산합니다.
+    현재 serial보다 항상 큰 값을 반환하므로 하루에 100번 이상 변경되어도 단조 증가합니다.
+    """
+    today = today or time.strftime('%Y%m%d')
+    candidate = int(today) * 100 + 1
+    if current_serial is not None and current_serial >= candidate:
+        return current_serial + 1
+    return candidate
+
+
+def diff_records(current, desired):
+    """두 레코드 집합을 비교하여 (삭제할 레코드, 추가할 레코드) 목록을 반환합니다."""
+    removed = sorted(k for k in current
+                     if k[1] not in UNMANAGED_TYPES
+                     and (k not in desired or desired[k] != current[k]))
+    added = sorted(k for k in desired
+                   if k[1] not in UNMANAGED_TYPES
+                   and (k not in current or current[k] != desired[k]))
+    return removed, [(k, desired[k]) for k in added]
+
+
+def build_nsupdate_script(zone, removed, added):
+    """변경된 레코드만 반영하는 nsupdate 입력 스크립트를 생성합니다. ('nsupdate -l'로 실행)"""
+    lines = [f"zone {zone.rstrip('.')}."]
+    for name, rtype, rdata in removed:
+        lines.append(f"update delete {name} {rtype} {rdata}")
+    for (name, rtype, rdata), ttl in added:
+        lines.append(f"update add {name} {ttl} {rtype} {rdata}")
+    lines.append("send")
+    return '\n'.join(lines) + '\n'
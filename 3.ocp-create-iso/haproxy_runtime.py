@@ -0,0 +1,119 @@
+import re
+import socket
+
+# --- HAProxy Runtime API 헬퍼 ---
+# haproxy.cfg의 backend/server 구성을 파싱하고, 현재 구성과 목표 구성의 차이를
+# stats socket(Runtime API) 명령으로 변환하여 재시작 없이 반영합니다.
+
+STATS_SOCKET_PATH = "/var/lib/haproxy/stats"
+# Runtime API는 오류도 일반 텍스트로 돌려주므로, 성공으로 간주할 응답을 명시합니다.
+OK_RESPONSES = ("New server registered.", "Server deleted.", "IP changed from",
+                "no need to change the addr", "port changed from", "no need to change the port")
+SERVER_LINE = re.compile(r'^\s*server\s+(\S+)\s+(\S+?):(\d+)(.*)$')
+SECTION_LINE = re.compile(r'^(global|defaults|frontend|backend|listen|resolvers|peers)\b\s*(\S*)')
+
+
+def send_command(command, socket_path=STATS_SOCKET_PATH, timeout=5):
+    """stats socket에 명령 하나를 보내고 응답 텍스트를 반환합니다."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(f"{command}\n".encode())
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return b''.join(chunks).decode().strip()
+
+
+def is_ok_response(response):
+    return not response or response.startswith(OK_RESPONSES)
+
+
+def _server_options(rest):
+    tokens = rest.split()
+    weight = None
+    if 'weight' in tokens and tokens.index('weight') + 1 < len(tokens):
+        weight = int(tokens[tokens.index('weight') + 1])
+    return {"weight": weight, "disabled": 'disabled' in tokens}
+
+
+def parse_backends(cfg_text):
+    """
+    haproxy.cfg에서 backend/listen 섹션별 server 목록을 추출합니다.
+    {backend: {server: {"addr", "port", "weight", "disabled"}}} 형태로 반환합니다.
+    """
+    backends, section = {}, None
+    for line in cfg_text.splitlines():
+        line = line.split('#', 1)[0].rstrip()
+        if not line.strip():
+            continue
+        match = SECTION_LINE.match(line)
+        if match:
+            kind, name = match.groups()
+            section = name if kind in ('backend', 'listen') else None
+            if section:
+                backends.setdefault(section, {})
+            continue
+        match = SERVER_LINE.match(line)
+        if match and section:
+            name, addr, port, rest = match.groups()
+            backends[section][name] = {"addr": addr, "port": int(port), **_server_options(rest)}
+    return backends
+
+
+def structure_of(cfg_text):
+    """server 행과 주석/공백을 제외한 설정 골격을 반환합니다. 이 값이 다르면 reload가 필요합니다."""
+    lines = []
+    for line in cfg_text.splitlines():
+        line = line.split('#', 1)[0].rstrip()
+        if line.strip() and not SERVER_LINE.match(line):
+            lines.append(' '.join(line.split()))
+    return '\n'.join(lines)
+
+
+def plan_commands(current, desired):
+    """현재/목표 backend 구성의 차이를 Runtime API 명령 목록으로 변환합니다."""
+    commands = []
+    for backend in sorted(set(current) | set(desired)):
+        cur, new = current.get(backend, {}), desired.get(backend, {})
+        for name in sorted(set(cur) - set(new)):
+            target = f"{backend}/{name}"
+            commands += [f"set server {target} state maint",
+                         f"shutdown sessions server {target}",
+                         f"disable health {target}",
+                         f"del server {target}"]
+        for name in sorted(set(new) - set(cur)):
+            target, srv = f"{backend}/{name}", new[name]
+            add = f"add server {target} {srv['addr']}:{srv['port']} check"
+            if srv['weight'] is not None:
+                add += f" weight {srv['weight']}"
+            commands += [add, f"enable health {target}"]
+            if not srv['disabled']:
+                commands.append(f"enable server {target}")
+        for name in sorted(set(cur) & set(new)):
+            target, old, srv = f"{backend}/{name}", cur[name], new[name]
+            if (old['addr'], old['port']) != (srv['addr'], srv['port']):
+                commands.append(f"set server {target} addr {srv['addr']} port {srv['port']}")
+            if old['weight'] != srv['weight']:
+                commands.append(f"set server {target} weight {1 if srv['weight'] is None else srv['weight']}")
+            if old['disabled'] != srv['disabled']:
+                commands.append(f"set server {target} state {'maint' if srv['disabled'] else 'ready'}")
+    return commands
+
+
+def apply_commands(commands, socket_path=STATS_SOCKET_PATH):
+    """명령을 순서대로 실행합니다. 실패한 명령이 있으면 즉시 중단하고 (성공 여부, 로그)를 반환합니다."""
+    log = []
+    for command in commands:
+        try:
+            response = send_command(command, socket_path)
+        except OSError as e:
+            log.append(f"{command} -> {e}")
+            return False, log
+        log.append(f"{command} -> {response or 'OK'}")
+        if not is_ok_response(response):
+            return False, log
+    return True, log
@@ -49,6 +49,17 @@ document.addEventListener('DOMContentLoaded', () => {
         showResult(outputBox, result, 'upload');
     });
 
+    // Section 2: HAProxy server 상태 변경 (Runtime API)
+    document.getElementById('haproxy-server-form').addEventListener('submit', async (e) => {
+        e.preventDefault();
+        const outputBox = document.getElementById('output-haproxy-server');
+        outputBox.textContent = '명령 실행 중...';
+
+        const body = Object.fromEntries(new FormData(e.target).entries());
+        const result = await callApi('/api/haproxy-server', body);
+        showResult(outputBox, result, 'haproxy-server');
+    });
+
     // Section 2, 3, 5, 6: Button Actions
     document.querySelectorAll('button[data-action-type]').forEach(button => {
         button.addEventListener('click', async () => {
@@ -94,4 +105,48 @@ document.addEventListener('DOMContentLoaded', () => {
             alert('CA 인증서가 클립보드에 복사되었습니다.');
         });
     }
+
+    // 설치 단계별 소요 시간 (타임라인, 현재 설치 실행 기준)
+    const formatRun = (run) => `${run.cluster || '(클러스터 미지정)'} / ${run.version || '(버전 미지정)'}`;
+    const loadTimeline = async () => {
+        const outputBox = document.getElementById('output-timeline');
+        outputBox.textContent = '불러오는 중...';
+        try {
+            const response = await fetch('/api/timeline');
+            const timeline = await response.json();
+            const lines = [`현재 실행: ${timeline.run.run_id || '-'}  (${formatRun(timeline.run)})`, ''];
+            if (!timeline.stages.length) {
+                lines.push('현재 실행에 기록된 설치 단계가 없습니다.');
+            } else {
+                const formatTime = (ts) => new Date(ts * 1000).toLocaleString();
+                timeline.stages.forEach(s => lines.push(
+                    `${s.stage.padEnd(12)} ${String(s.total_duration.toFixed(1)).padStart(10)}초  ` +
+                    `실행 ${s.count}회, 실패 ${s.failures}회  (${formatTime(s.first_started_at)} ~ ${formatTime(s.last_finished_at)})`));
+                const slowest = timeline.stages.reduce((a, b) => (a.total_duration >= b.total_duration ? a : b));
+                lines.push('', `가장 오래 걸린 단계: ${slowest.stage} (${slowest.total_duration.toFixed(1)}초)`);
+            }
+            const previous = timeline.runs.filter(r => r.run_id && r.run_id !== timeline.run.run_id);
+            if (previous.length) {
+                lines.push('', '이전 실행 (단계별 초):');
+                previous.forEach(r => lines.push(
+                    `  ${r.run_id}  ${formatRun(r)}  [${r.hosts.join(', ')}]  ` +
+                    Object.entries(r.stages).map(([stage, sec]) => `${stage}=${sec.toFixed(1)}`).join(' ')));
+            }
+            outputBox.textContent = lines.join('\n');
+        } catch (error) {
+            outputBox.textContent = `❌ 타임라인을 불러오지 못했습니다: ${error}`;
+        }
+    };
+    const timelineBtn = document.getElementById('btn_load_timeline');
+    if (timelineBtn) {
+        timelineBtn.addEventListener('click', loadTimeline);
+    }
+    const resetTimelineBtn = document.getElementById('btn_reset_timeline');
+    if (resetTimelineBtn) {
+        resetTimelineBtn.addEventListener('click', async () => {
+            if (!confirm('새 설치 실행을 시작합니다. 이후 기록은 새 실행으로 집계됩니다. 계속하시겠습니까?')) return;
+            await callApi('/api/timeline/reset', {});
+            loadTimeline();
+        });
+    }
 });
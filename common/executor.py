@@ -0,0 +1,402 @@
+import codecs
+import collections
+import fcntl
+import itertools
+import json
+import os
+import select
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+# --- 명령 실행기 ---
+# 셸을 거치지 않고 argv 목록으로 명령을 실행합니다.
+# stdout/stderr는 크기가 제한된 링 버퍼와 로그 파일로 스트리밍하고,
+# 명령별 타임아웃/취소를 지원하며 실행 시간, CPU 시간, 최대 RSS를 기록합니다.
+# 몇 시간씩 걸리는 명령은 start_detached()로 worker와 분리하여 실행합니다.
+# (원본은 저장소 최상위 common/에 두고, 각 앱의 배포 스크립트가 앱 디렉터리로 복사합니다.)
+
+LOG_DIR = "/ocp_install/logs"
+COMMAND_LOG_FILE = os.path.join(LOG_DIR, "commands.log")
+DEFAULT_TIMEOUT = 600           # 초
+RING_BUFFER_LINES = 2000        # 스트림별로 메모리에 유지하는 마지막 줄 수
+MAX_LINE_LENGTH = 8192          # 한 줄이 이보다 길면 잘라서 보관
+KILL_GRACE_SECONDS = 5
+DRAIN_SECONDS = 0.5             # 프로세스 종료 후 파이프에 남은 출력을 읽는 최대 시간
+
+HISTORY = collections.deque(maxlen=500)     # 최근 명령 실행 기록 (단계별 소요 시간 확인용)
+RUNNING = {}                                # command_id -> Command
+LISTENERS = []                              # 명령 종료 시 stats를 받는 콜백 (metrics 등)
+_ids = itertools.count(1)
+_lock = threading.Lock()
+_log_lock = threading.Lock()
+_log_files = {}
+
+
+def _write_log(path, text):
+    """로그 파일에 기록합니다. 파일 핸들은 경로별로 한 번만 열어 재사용합니다."""
+    try:
+        with _log_lock:
+            f = _log_files.get(path)
+            if f is None or f.closed:
+                f = _log_files[path] = open(path, 'a', encoding='utf-8')
+            f.write(text)
+            f.flush()
+    except OSError:
+        pass
+
+
+def _close_log(path):
+    with _log_lock:
+        f = _log_files.pop(path, None)
+        if f:
+            f.close()
+
+
+class Command:
+    """실행 중이거나 종료된 명령 하나. start()로 시작하고 wait()로 결과를 받습니다."""
+
+    def __init__(self, argv, env=None, cwd=None, input=None, timeout=DEFAULT_TIMEOUT,
+                 stdout_path=None, log_path=None, redact=()):
+        self.id = next(_ids)
+        self.argv = [str(a) for a in argv]
+        self.env = {**os.environ, **{k: str(v) for k, v in (env or {}).items()}} if env else None
+        self.cwd = cwd
+        self.input = input
+        self.timeout = timeout
+        self.stdout_path = stdout_path
+        self.log_path = log_path or COMMAND_LOG_FILE
+        self.redact = [r for r in redact if r]
+        self.stdout = collections.deque(maxlen=RING_BUFFER_LINES)
+        self.stderr = collections.deque(maxlen=RING_BUFFER_LINES)
+        self.lines_seen = 0
+        self.bytes_read = 0
+        self.timed_out = False
+        self.cancelled = False
+        self.process = None
+        self.result = None
+        self._readers = []
+        self._stop_reading = threading.Event()
+
+    def program(self):
+        """sudo를 제외한 실제 실행 프로그램 이름"""
+        argv = self.argv[1:] if self.argv[0] == 'sudo' and len(self.argv) > 1 else self.argv
+        return os.path.basename(argv[0])
+
+    def _mask(self, text):
+        for secret in self.redact:
+            text = text.replace(secret, '****')
+        return text
+
+    def display(self):
+        return self._mask(' '.join(self.argv))
+
+    def _collect(self, lines, buffer, label):
+        # 명령 출력에도 비밀번호 등이 찍힐 수 있으므로 링 버퍼/로그에 넣기 전에 가립니다.
+        lines = [self._mask(line if len(line) <= MAX_LINE_LENGTH else line[:MAX_LINE_LENGTH] + '...[truncated]')
+                 for line in lines]
+        buffer.extend(line + '\n' for line in lines)
+        self.lines_seen += len(lines)
+        _write_log(self.log_path, ''.join(f"[{self.id} {label}] {line}\n" for line in lines))
+
+    def _read_stream(self, stream, buffer, label):
+        """
+        파이프를 청크 단위로 읽어 링 버퍼와 로그 파일로 흘려보냅니다.
+        백그라운드로 남은 자식 프로세스가 파이프를 계속 열고 있을 수 있으므로
+        EOF만 기다리지 않고, wait()가 중단을 요청하면 읽기를 멈춥니다.
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        pending = ''
+        fd = stream.fileno()
+        while not self._stop_reading.is_set():
+            ready, _, _ = select.select([fd], [], [], 0.1)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            self.bytes_read += len(chunk)
+            lines = (pending + decoder.decode(chunk)).split('\n')
+            pending = lines.pop()
+            if len(pending) > MAX_LINE_LENGTH:
+                lines.append(pending)
+                pending = ''
+            self._collect(lines, buffer, label)
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            self._collect([pending], buffer, label)
+        stream.close()
+
+    def _feed_input(self):
+        try:
+            self.process.stdin.write(self.input.encode() if isinstance(self.input, str) else self.input)
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+    def start(self):
+        _write_log(self.log_path, f"[{self.id}] $ {self.display()}\n")
+        stdout_file = open(self.stdout_path, 'wb') if self.stdout_path else None
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        try:
+            self.process = subprocess.Popen(
+                self.argv, env=self.env, cwd=self.cwd,
+                stdin=subprocess.PIPE if self.input is not None else subprocess.DEVNULL,
+                stdout=stdout_file or subprocess.PIPE, stderr=subprocess.PIPE,
+                start_new_session=True,
+            )
+        finally:
+            if stdout_file:
+                stdout_file.close()
+        if self.input is not None:
+            threading.Thread(target=self._feed_input, daemon=True).start()
+        streams = [(self.process.stderr, self.stderr, 'err')]
+        if not self.stdout_path:
+            streams.append((self.process.stdout, self.stdout, 'out'))
+        for stream, buffer, label in streams:
+            reader = threading.Thread(target=self._read_stream, args=(stream, buffer, label), daemon=True)
+            reader.start()
+            self._readers.append(reader)
+        with _lock:
+            RUNNING[self.id] = self
+        return self
+
+    def _signal(self, sig):
+        try:
+            os.killpg(self.process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def cancel(self):
+        """명령(프로세스 그룹 전체)을 중단합니다."""
+        self.cancelled = True
+        self._signal(signal.SIGTERM)
+
+    def wait(self):
+        """종료될 때까지 기다린 뒤 결과 딕셔너리를 반환합니다. 타임아웃이 지나면 강제로 종료합니다."""
+        if self.result is not None:
+            return self.result
+        pid, delay, terminated_at = self.process.pid, 0.001, None
+        while True:
+            waited, status, rusage = os.wait4(pid, os.WNOHANG)
+            if waited:
+                break
+            elapsed = time.monotonic() - self._started
+            if self.timeout and elapsed > self.timeout and not self.timed_out:
+                self.timed_out = True
+                self._signal(signal.SIGTERM)
+            if (self.timed_out or self.cancelled) and terminated_at is None:
+                terminated_at = time.monotonic()
+            if terminated_at and time.monotonic() - terminated_at > KILL_GRACE_SECONDS:
+                self._signal(signal.SIGKILL)
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+        self.process.returncode = os.waitstatus_to_exitcode(status)
+        # 남은 출력은 짧게만 읽고, 파이프를 물려받은 자식이 살아 있어도 reader를 정리합니다.
+        drain_deadline = time.monotonic() + DRAIN_SECONDS
+        for reader in self._readers:
+            reader.join(timeout=max(0, drain_deadline - time.monotonic()))
+        self._stop_reading.set()
+        for reader in self._readers:
+            reader.join()
+        with _lock:
+            RUNNING.pop(self.id, None)
+
+        wall_time = time.monotonic() - self._started
+        error = ''.join(self.stderr)
+        if self.timed_out:
+            error += f"\n명령이 제한 시간({self.timeout}초)을 초과하여 중단되었습니다."
+        elif self.cancelled:
+            error += "\n명령이 취소되었습니다."
+        self.result = {
+            "success": self.process.returncode == 0 and not self.timed_out and not self.cancelled,
+            "output": ''.join(self.stdout),
+            "error": error,
+            "returncode": self.process.returncode,
+            "truncated": self.lines_seen > len(self.stdout) + len(self.stderr),
+            "stats": {
+                "command": self.display(),
+                "program": self.program(),
+                "started_at": self.started_at,
+                "wall_time": round(wall_time, 3),
+                "cpu_time": round(rusage.ru_utime + rusage.ru_stime, 3),
+                "max_rss_kb": rusage.ru_maxrss,
+                "bytes_read": self.bytes_read,
+                "bytes_written": len(self.input.encode() if isinstance(self.input, str) else self.input or b''),
+                "success": self.process.returncode == 0 and not self.timed_out and not self.cancelled,
+            },
+        }
+        HISTORY.append(self.result['stats'])
+        for listener in LISTENERS:
+            try:
+                listener(self.result['stats'])
+            except Exception as e:
+                print(f"WARNING: executor listener failed: {e}")
+        _write_log(self.log_path, f"[{self.id}] exit={self.process.returncode} wall={wall_time:.3f}s "
+                                  f"cpu={self.result['stats']['cpu_time']}s maxrss={rusage.ru_maxrss}KB\n")
+        if self.log_path != COMMAND_LOG_FILE:
+            _close_log(self.log_path)
+        return self.result
+
+
+def start(argv, **kwargs):
+    """명령을 백그라운드로 시작하고 Command 객체를 반환합니다."""
+    return Command(argv, **kwargs).start()
+
+
+def run(argv, **kwargs):
+    """명령을 실행하고 결과({"success", "output", "error", "returncode", "stats", ...})를 반환합니다."""
+    try:
+        return start(argv, **kwargs).wait()
+    except OSError as e:
+        return {"success": False, "output": "", "error": f"명령 실행 실패({argv[0]}): {e}",
+                "returncode": None, "truncated": False, "stats": None}
+
+
+def run_sequence(commands, **kwargs):
+    """
+    여러 명령을 순서대로 실행합니다. (셸의 'a && b'와 동일)
+    첫 번째 실패에서 중단하며, 출력은 이어 붙이고 명령별 stats는 목록으로 반환합니다.
+    """
+    combined = {"success": True, "output": "", "error": "", "returncode": 0, "truncated": False, "stats": []}
+    for argv in commands:
+        result = run(argv, **kwargs)
+        combined['output'] += result['output']
+        combined['error'] += result['error']
+        combined['truncated'] = combined['truncated'] or result['truncated']
+        combined['stats'].append(result['stats'])
+        if not result['success']:
+            combined.update(success=False, returncode=result['returncode'])
+            break
+    return combined
+
+
+def cancel(command_id):
+    """실행 중인 명령을 id로 찾아 취소합니다. 이 프로세스에서 시작한 명령만 취소할 수 있습니다."""
+    with _lock:
+        command = RUNNING.get(command_id)
+    if command is None:
+        return False
+    command.cancel()
+    return True
+
+
+def process_start_time(pid):
+    """/proc/<pid>/stat의 시작 시각(부팅 후 clock tick)을 반환합니다. 프로세스가 없으면 None을 반환합니다."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # comm(2번째 필드)에 공백/괄호가 있을 수 있으므로 마지막 ')' 이후부터 나눕니다.
+            return int(f.read().rsplit(')', 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def cancel_process_group(pid, start_time=None):
+    """
+    다른 gunicorn worker에서 시작한 명령을 pid(프로세스 그룹 id)로 중단합니다.
+    start_time을 주면 pid가 재사용된 다른 프로세스가 아닌지 확인한 뒤에만 신호를 보냅니다.
+    """
+    if start_time is not None and process_start_time(pid) != start_time:
+        return False
+    try:
+        os.killpg(pid, signal.SIGTERM)
+        return True
+    except (ProcessLookupError, PermissionError):
+        return False
+
+
+# --- 분리 실행(detached) 작업 ---
+# oc mirror처럼 오래 걸리는 명령은 gunicorn worker가 재시작/종료되어도 계속 실행되어야 합니다.
+# 이 파일을 감시 프로세스로 새 세션에서 실행하고, 명령의 stdout/stderr는 파이프 없이 로그 파일에 직접 연결합니다.
+# 감시 프로세스가 종료를 기다려 작업 파일(job_path)에 결과를 기록하고 타임라인 이벤트를 추가합니다.
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def read_job(job_path):
+    """작업 파일({"pid", "start_time", "status", ...})을 읽습니다. 없거나 손상되었으면 None을 반환합니다."""
+    try:
+        with open(job_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def job_running(job):
+    """작업이 아직 실행 중인지 확인합니다. (pid가 재사용되었으면 시작 시각이 달라 실행 중이 아닌 것으로 봅니다)"""
+    return bool(job) and job.get('status') == 'running' \
+        and process_start_time(job['pid']) == job.get('start_time')
+
+
+def start_detached(argv, job_path, log_path, env=None, cwd=None, event=None, event_path=None):
+    """
+    명령을 worker와 분리하여 실행하고 작업 정보를 반환합니다. 같은 작업이 이미 실행 중이면 None을 반환합니다.
+    event가 주어지면 명령 종료 시 {**event, "duration", "success"}를 event_path(JSONL)에 한 줄로 추가합니다.
+    """
+    spec = {"argv": [str(a) for a in argv], "job_path": job_path, "event": event, "event_path": event_path}
+    with open(f"{job_path}.lock", 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if job_running(read_job(job_path)):
+            return None
+        with open(log_path, 'a') as log:
+            process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), json.dumps(spec)],
+                env={**os.environ, **{k: str(v) for k, v in (env or {}).items()}}, cwd=cwd,
+                stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True,
+            )
+        # 감시 프로세스의 결과 기록도 같은 잠금 안에서 하므로 이 'running' 기록이 결과를 덮어쓰지 않습니다.
+        job = {"pid": process.pid, "start_time": process_start_time(process.pid), "started_at": time.time(),
+               "command": ' '.join(spec['argv']), "status": "running"}
+        _write_json(job_path, job)
+    return job
+
+
+def cancel_job(job_path):
+    """분리 실행 중인 작업(감시 프로세스와 명령의 프로세스 그룹)을 중단합니다."""
+    job = read_job(job_path)
+    if not job_running(job):
+        return False
+    return cancel_process_group(job['pid'], job['start_time'])
+
+
+def _supervise(spec):
+    """감시 프로세스 본체: 명령을 실행하고 종료를 기다린 뒤 결과를 작업 파일과 이벤트 파일에 기록합니다."""
+    cancelled = []
+    # 취소 시 프로세스 그룹 전체가 SIGTERM을 받으므로, 감시 프로세스는 기록을 마칠 때까지 남아 있습니다.
+    signal.signal(signal.SIGTERM, lambda signum, frame: cancelled.append(signum))
+    started = time.monotonic()
+    print(f"[detached] $ {' '.join(spec['argv'])}", flush=True)
+    returncode, cpu_time = None, 0.0
+    try:
+        child = subprocess.Popen(spec['argv'])
+    except OSError as e:
+        print(f"[detached] 명령 실행 실패: {e}", flush=True)
+    else:
+        _, status, rusage = os.wait4(child.pid, 0)
+        returncode = os.waitstatus_to_exitcode(status)
+        cpu_time = round(rusage.ru_utime + rusage.ru_stime, 3)
+    wall_time = round(time.monotonic() - started, 3)
+    success = returncode == 0 and not cancelled
+    print(f"[detached] exit={returncode} wall={wall_time:.3f}s cpu={cpu_time}s", flush=True)
+
+    with open(f"{spec['job_path']}.lock", 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        job = read_job(spec['job_path']) or {}
+        job.update(status="cancelled" if cancelled else "finished", returncode=returncode, success=success,
+                   finished_at=time.time(), wall_time=wall_time, cpu_time=cpu_time)
+        _write_json(spec['job_path'], job)
+    if spec.get('event') and spec.get('event_path'):
+        with open(spec['event_path'], 'a', encoding='utf-8') as f:
+            f.write(json.dumps({**spec['event'], "duration": wall_time, "success": success}, ensure_ascii=False) + "\n")
+
+
+if __name__ == '__main__':
+    _supervise(json.loads(sys.argv[1]))
@@ -0,0 +1,367 @@
+import fcntl
+import glob
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+from flask import Response, g, jsonify, request
+
+import executor
+
+# --- 성능 계측 ---
+# Flask 라우트/액션별 지연 시간 히스토그램, 하위 프로세스 수와 입출력 바이트,
+# 설치 단계별 타임라인(download → mirror → registry → push → DNS/HAProxy → config → ISO → install)을 기록하고
+# /metrics(Prometheus 텍스트 형식)와 /api/timeline(JSON)으로 노출합니다.
+# gunicorn worker마다 메모리가 분리되므로, 각 worker의 값을 파일로 남기고 조회 시 합산합니다.
+# 타임라인 이벤트에는 설치 실행(run) id와 클러스터 이름/OCP 버전을 함께 기록하여 실행 단위로 조회합니다.
+# (원본은 저장소 최상위 common/에 두고, 각 앱의 배포 스크립트가 앱 디렉터리로 복사합니다.)
+
+DATA_DIR = "/ocp_install/data"
+METRICS_DIR = os.path.join(DATA_DIR, "metrics")
+TIMELINE_PATH = os.path.join(DATA_DIR, "timeline.jsonl")
+RUN_PATH = os.path.join(DATA_DIR, "install_run.json")
+BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 600, 1800, 3600)
+STAGES = ('download', 'mirror', 'registry', 'push', 'dns_haproxy', 'config', 'iso', 'install')
+
+_lock = threading.Lock()
+_counters = {}      # (name, labels) -> float
+_histograms = {}    # (name, labels) -> {"buckets": [...], "sum": float, "count": int}
+_app_name = None
+_worker = {"pid": None, "id": None}
+
+
+def _labels(**labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    with _lock:
+        key = (name, _labels(**labels))
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    with _lock:
+        key = (name, _labels(**labels))
+        hist = _histograms.setdefault(key, {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0})
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                hist["buckets"][i] += 1
+                break
+        hist["sum"] += value
+        hist["count"] += 1
+
+
+def _snapshot():
+    with _lock:
+        return {
+            "counters": [[name, list(labels), value] for (name, labels), value in _counters.items()],
+            "histograms": [[name, list(labels), hist] for (name, labels), hist in _histograms.items()],
+        }
+
+
+def _worker_id():
+    """
+    스냅샷 파일 이름에 쓰는 worker 식별자.
+    pid는 재사용되므로 프로세스마다 uuid를 붙여, 종료된 worker의 누적 값이 새 worker에 덮어써지지 않게 합니다.
+    (fork 이후 pid가 바뀌면 새로 만듭니다)
+    """
+    if _worker["pid"] != os.getpid():
+        _worker.update(pid=os.getpid(), id=f"{os.getpid()}-{uuid.uuid4().hex[:12]}")
+    return _worker["id"]
+
+
+def _ensure_dirs():
+    """
+    DATA_DIR/METRICS_DIR을 필요할 때 만듭니다.
+    앱 import 시점에는 /ocp_install 권한 설정 전일 수 있으므로 기록할 때마다 확인합니다.
+    """
+    os.makedirs(METRICS_DIR, exist_ok=True)
+
+
+def _persist():
+    """이 worker의 값을 METRICS_DIR/<app>-<pid>-<uuid>.json에 원자적으로 기록합니다."""
+    path = os.path.join(METRICS_DIR, f"{_app_name}-{_worker_id()}.json")
+    try:
+        _ensure_dirs()
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(_snapshot(), f)
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        print(f"WARNING: failed to persist metrics: {e}")
+
+
+def _merged():
+    """모든 worker(종료된 worker 포함)의 스냅샷을 합산합니다."""
+    counters, histograms = {}, {}
+    for path in glob.glob(os.path.join(METRICS_DIR, f"{_app_name}-*.json")):
+        try:
+            with open(path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, hist in snapshot["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            total = histograms.setdefault(key, {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0})
+            total["buckets"] = [a + b for a, b in zip(total["buckets"], hist["buckets"])]
+            total["sum"] += hist["sum"]
+            total["count"] += hist["count"]
+    return counters, histograms
+
+
+def _format_labels(labels, **extra):
+    pairs = list(labels) + sorted(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in pairs) + "}"
+
+
+def render_prometheus():
+    counters, histograms = _merged()
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE {name} counter")
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# TYPE {name} histogram")
+        for (n, labels), hist in sorted(histograms.items(), key=lambda item: item[0]):
+            if n != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS, hist["buckets"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, le='+Inf')} {hist['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {hist['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+
+# --- 설치 타임라인 ---
+def current_run():
+    """현재 설치 실행 정보({"run_id", "started_at", "cluster", "version"})를 반환합니다."""
+    try:
+        with open(RUN_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_run(run):
+    with open(f"{RUN_PATH}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(run, f, ensure_ascii=False)
+    os.replace(f"{RUN_PATH}.tmp", RUN_PATH)
+
+
+def _new_run(previous):
+    return {**previous, "run_id": time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6], "started_at": time.time()}
+
+
+def set_run(cluster=None, version=None):
+    """
+    현재 실행의 클러스터 이름/OCP 버전을 기록합니다.
+    비어 있던 값은 채우기만 하고, 이미 기록된 값과 다른 값이 들어오면 새 실행을 시작합니다.
+    """
+    updates = {k: v for k, v in (("cluster", cluster), ("version", version)) if v}
+    try:
+        _ensure_dirs()
+        with open(f"{RUN_PATH}.lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            run = current_run()
+            if run and all(run.get(k) == v for k, v in updates.items()):
+                return run
+            if not run or any(run.get(k) not in (None, v) for k, v in updates.items()):
+                run = _new_run(run)
+            run.update(updates)
+            _write_run(run)
+            return run
+    except OSError as e:
+        print(f"WARNING: failed to update install run: {e}")
+        return current_run()
+
+
+def reset_run():
+    """같은 클러스터/버전으로 새 실행을 시작합니다. (재설치 시 이전 기록과 분리)"""
+    try:
+        _ensure_dirs()
+        with open(f"{RUN_PATH}.lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            run = _new_run(current_run())
+            _write_run(run)
+            return run
+    except OSError as e:
+        print(f"WARNING: failed to reset install run: {e}")
+        return current_run()
+
+
+def _event(stage, action, started_at):
+    run = current_run() or set_run()
+    return {
+        "run_id": run.get("run_id"), "cluster": run.get("cluster"), "version": run.get("version"),
+        "app": _app_name, "host": socket.gethostname(), "stage": stage, "action": action,
+        "started_at": round(started_at, 3),
+    }
+
+
+def job_event(stage, action):
+    """
+    executor.start_detached()에 넘길 이벤트를 만듭니다. (duration/success는 감시 프로세스가 채웁니다)
+    worker와 분리되어 기록되므로 /metrics의 단계 히스토그램에는 포함되지 않고 타임라인에만 남습니다.
+    """
+    return _event(stage, action, time.time())
+
+
+def record_event(stage, action, started_at, duration, success):
+    """설치 단계 이벤트 한 건을 현재 실행 정보와 함께 모든 앱이 공유하는 timeline.jsonl에 추가합니다."""
+    event = {**_event(stage, action, started_at), "duration": round(duration, 3), "success": bool(success)}
+    observe("ocp_stage_duration_seconds", duration, app=_app_name, stage=stage, version=event["version"] or "")
+    try:
+        _ensure_dirs()
+        # 한 줄 단위 O_APPEND 쓰기라 여러 앱/worker가 동시에 기록해도 줄이 섞이지 않습니다.
+        with open(TIMELINE_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"WARNING: failed to record timeline event: {e}")
+    _persist()
+
+
+def _summarize(events):
+    stages = {}
+    for event in events:
+        stage = stages.setdefault(event["stage"], {"first_started_at": event["started_at"], "last_finished_at": 0,
+                                                   "total_duration": 0.0, "count": 0, "failures": 0})
+        stage["first_started_at"] = min(stage["first_started_at"], event["started_at"])
+        stage["last_finished_at"] = round(max(stage["last_finished_at"], event["started_at"] + event["duration"]), 3)
+        stage["total_duration"] = round(stage["total_duration"] + event["duration"], 3)
+        stage["count"] += 1
+        stage["failures"] += 0 if event["success"] else 1
+    ordered = [dict(stage=name, **stages[name]) for name in STAGES if name in stages]
+    ordered += [dict(stage=name, **summary) for name, summary in stages.items() if name not in STAGES]
+    return ordered
+
+
+def load_timeline(run_id=None, cluster=None, version=None, all_runs=False):
+    """
+    타임라인 이벤트와 단계별 요약을 반환합니다.
+    기본값은 현재 실행만 집계하며, run_id/cluster/version으로 거르거나 all_runs로 전체를 집계합니다.
+    runs에는 실행별(클러스터/버전/호스트) 단계 소요 시간을 담아 bastion·릴리스 간 비교에 사용합니다.
+    """
+    events = []
+    try:
+        with open(TIMELINE_PATH, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+
+    runs = {}
+    for event in events:
+        run = runs.setdefault(event.get("run_id"), {"run_id": event.get("run_id"), "cluster": event.get("cluster"),
+                                                    "version": event.get("version"), "hosts": set(), "events": []})
+        # 클러스터 이름/버전은 실행 도중에 채워질 수 있으므로 가장 최근 값을 사용합니다.
+        run["cluster"] = event.get("cluster") or run["cluster"]
+        run["version"] = event.get("version") or run["version"]
+        run["hosts"].add(event.get("host"))
+        run["events"].append(event)
+    run_summaries = [{"run_id": run["run_id"], "cluster": run["cluster"], "version": run["version"],
+                      "hosts": sorted(h for h in run["hosts"] if h),
+                      "stages": {s["stage"]: s["total_duration"] for s in _summarize(run["events"])}}
+                     for run in runs.values()]
+
+    current = current_run()
+    if not (all_runs or run_id or cluster or version):
+        run_id = current.get("run_id")
+    selected = [e for e in events
+                if (all_runs or not run_id or e.get("run_id") == run_id)
+                and (not cluster or e.get("cluster") == cluster)
+                and (not version or e.get("version") == version)]
+    return {"run": current, "events": selected, "stages": _summarize(selected), "runs": run_summaries}
+
+
+# --- Flask 연동 ---
+def _on_command_finished(stats):
+    labels = {"app": _app_name, "program": stats["program"]}
+    inc("ocp_subprocess_total", success=stats["success"], **labels)
+    observe("ocp_subprocess_duration_seconds", stats["wall_time"], **labels)
+    inc("ocp_subprocess_cpu_seconds_total", stats["cpu_time"], **labels)
+    inc("ocp_subprocess_bytes_read_total", stats["bytes_read"], **labels)
+    inc("ocp_subprocess_bytes_written_total", stats["bytes_written"], **labels)
+
+
+def _response_success(response):
+    if response.status_code >= 400:
+        return False
+    if response.direct_passthrough or response.is_streamed:
+        return True
+    if response.is_json:
+        body = response.get_json(silent=True)
+        return bool(body.get("success", True)) if isinstance(body, dict) else True
+    # 텍스트 응답을 쓰는 라우트는 실패 시 '❌'로 시작하는 메시지를 반환합니다.
+    return not response.get_data(as_text=True).startswith("❌")
+
+
+def init_app(app, app_name, stages):
+    """
+    Flask 앱에 계측 훅과 /metrics, /api/timeline 라우트를 등록합니다.
+    stages는 액션 이름(type/command_key) 또는 endpoint 이름을 설치 단계로 매핑합니다.
+    """
+    global _app_name
+    _app_name = app_name
+    try:
+        _ensure_dirs()
+    except OSError as e:
+        print(f"WARNING: failed to create {METRICS_DIR}: {e}")
+    executor.LISTENERS.append(_on_command_finished)
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started_at = time.time()
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        if request.endpoint in (None, 'static', 'metrics', 'timeline', 'timeline_reset') or 'metrics_started' not in g:
+            return response
+        duration = time.perf_counter() - g.metrics_started
+        body = request.get_json(silent=True) if request.is_json else None
+        action = (body.get('type') or body.get('command_key')) if isinstance(body, dict) else None
+        success = _response_success(response)
+
+        observe("ocp_http_request_duration_seconds", duration, app=app_name, endpoint=request.endpoint,
+                method=request.method, status=response.status_code)
+        inc("ocp_http_request_bytes_total", request.content_length or 0, app=app_name, direction="in")
+        inc("ocp_http_request_bytes_total", response.calculate_content_length() or 0, app=app_name, direction="out")
+        if action:
+            observe("ocp_action_duration_seconds", duration, app=app_name, action=action, success=success)
+
+        stage = stages.get(action) or stages.get(request.endpoint)
+        if stage:
+            record_event(stage, action or request.endpoint, g.metrics_started_at, duration, success)
+        else:
+            _persist()
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+    @app.route('/api/timeline')
+    def timeline():
+        args = request.args
+        return jsonify(load_timeline(run_id=args.get('run_id'), cluster=args.get('cluster'),
+                                     version=args.get('version'), all_runs=args.get('all') == '1'))
+
+    @app.route('/api/timeline/reset', methods=['POST'])
+    def timeline_reset():
+        return jsonify({"success": True, "run": reset_run()})
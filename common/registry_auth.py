@@ -0,0 +1,149 @@
+import base64
+import binascii
+import fcntl
+import json
+import os
+import tempfile
+import threading
+
+# --- Registry 인증 파일 관리 ---
+# Red Hat pull secret과 로컬 mirror registry 계정을 하나의 auth.json으로 병합하여 관리합니다.
+# base64 인코딩/검증/병합을 모두 프로세스 안에서 처리하므로 자격 증명이 셸 히스토리나 argv에 남지 않고,
+# 파일은 임시 파일 + rename으로 원자적으로 교체하며 apache 소유, 0600 권한으로 기록합니다.
+# 파싱 결과는 파일의 (mtime, size)를 기준으로 캐시하여 요청마다 다시 읽지 않습니다.
+# (원본은 저장소 최상위 common/에 두고, 각 앱의 배포 스크립트가 앱 디렉터리로 복사합니다.)
+
+AUTH_DIR = "/ocp_install/.auth"
+AUTH_FILE_PATH = os.path.join(AUTH_DIR, "auth.json")
+LOCK_PATH = os.path.join(AUTH_DIR, ".auth.lock")
+FILE_MODE = 0o600
+DIR_MODE = 0o700
+
+_cache_lock = threading.Lock()
+_cache = {"key": None, "auths": None}
+
+
+class AuthError(ValueError):
+    """pull secret 또는 인증 파일의 형식 오류"""
+
+
+def encode_credentials(user, password):
+    """'user:password'를 auth.json의 auth 필드 형식(base64)으로 변환합니다."""
+    return base64.b64encode(f"{user}:{password}".encode()).decode()
+
+
+def validate(config):
+    """
+    {"auths": {registry: {"auth": base64("user:password"), ...}}} 구조를 검증하고 auths를 반환합니다.
+    auth가 없는 항목은 username/password로 auth를 채웁니다.
+    """
+    if not isinstance(config, dict) or not isinstance(config.get('auths'), dict) or not config['auths']:
+        raise AuthError("'auths' 항목이 없는 인증 정보입니다.")
+    auths = {}
+    for registry, entry in config['auths'].items():
+        if not isinstance(entry, dict):
+            raise AuthError(f"{registry}: 인증 항목 형식이 올바르지 않습니다.")
+        entry = dict(entry)
+        if not entry.get('auth') and entry.get('username') and entry.get('password'):
+            entry['auth'] = encode_credentials(entry['username'], entry['password'])
+        try:
+            decoded = base64.b64decode(entry.get('auth') or '', validate=True).decode()
+        except (binascii.Error, UnicodeDecodeError):
+            raise AuthError(f"{registry}: auth 값이 올바른 base64 문자열이 아닙니다.")
+        if ':' not in decoded:
+            raise AuthError(f"{registry}: auth 값은 'user:password' 형식이어야 합니다.")
+        auths[registry] = entry
+    return auths
+
+
+def parse_pull_secret(text):
+    """붙여넣은 pull secret 텍스트를 파싱/검증하여 auths를 반환합니다."""
+    try:
+        config = json.loads(text)
+    except json.JSONDecodeError:
+        raise AuthError("유효하지 않은 JSON 형식입니다.")
+    return validate(config)
+
+
+def _file_key():
+    try:
+        st = os.stat(AUTH_FILE_PATH)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def load():
+    """현재 인증 파일의 auths를 반환합니다. 파일이 없으면 빈 딕셔너리를 반환합니다."""
+    key = _file_key()
+    with _cache_lock:
+        if key is not None and key == _cache['key']:
+            return dict(_cache['auths'])
+    if key is None:
+        return {}
+    with open(AUTH_FILE_PATH, encoding='utf-8') as f:
+        auths = validate(json.load(f))
+    with _cache_lock:
+        _cache.update(key=key, auths=auths)
+    return dict(auths)
+
+
+def _write(auths):
+    """auths를 임시 파일에 쓴 뒤 rename으로 교체합니다. (읽는 쪽은 항상 완전한 파일만 보게 됩니다)"""
+    fd, tmp_path = tempfile.mkstemp(dir=AUTH_DIR, prefix='.auth-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"auths": auths}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, FILE_MODE)
+        os.replace(tmp_path, AUTH_FILE_PATH)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    with _cache_lock:
+        _cache.update(key=_file_key(), auths=auths)
+
+
+def merge(updates):
+    """
+    기존 인증 파일에 registry별 항목(updates)을 병합하여 저장하고 전체 auths를 반환합니다.
+    같은 registry는 새 값으로 교체되고 나머지 항목은 유지됩니다.
+    여러 gunicorn worker/앱이 동시에 수정해도 항목이 유실되지 않도록 파일 잠금 안에서 처리합니다.
+    """
+    os.makedirs(AUTH_DIR, mode=DIR_MODE, exist_ok=True)
+    with open(LOCK_PATH, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            current = load()
+        except (OSError, json.JSONDecodeError, AuthError):
+            current = {}    # 손상된 파일은 새로 병합한 내용으로 교체합니다.
+        auths = {**current, **updates}
+        _write(auths)
+    return auths
+
+
+def apply_pull_secret(text):
+    """Red Hat pull secret을 검증하고 기존 로컬 registry 계정과 병합하여 저장합니다."""
+    return merge(parse_pull_secret(text))
+
+
+def add_registry(registry, user, password):
+    """로컬 mirror registry 계정을 인증 파일에 추가합니다."""
+    return merge({registry: {"auth": encode_credentials(user, password)}})
+
+
+def missing_registries(*registries):
+    """인증 파일에 자격 증명이 없는 registry 목록을 반환합니다. (명령 실행 전 사전 확인용)"""
+    try:
+        auths = load()
+    except (OSError, json.JSONDecodeError, AuthError):
+        auths = {}
+    return [r for r in registries
+            if not any(r == key or r.startswith(f"{key}/") for key in auths)]
+
+
+def command_env():
+    """인증 파일을 사용하도록 명령(oc, oc-mirror, podman)에 전달할 환경 변수"""
+    return {"REGISTRY_AUTH_FILE": AUTH_FILE_PATH, "XDG_RUNTIME_DIR": AUTH_DIR}